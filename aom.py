@@ -1,15 +1,39 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+from typing import TYPE_CHECKING, Dict, List, Optional, TextIO
 
 import click
 
-from artofmemory import cards, major, missing, pao
+# Every command imports the modules it needs when it runs, so that quick commands
+# like 'card' never pay for loading the major system's dictionaries
+if TYPE_CHECKING:
+    from artofmemory import major
 
 
 @click.group(help="Art of Memory")
-def cli():
-    pass
+@click.option(
+    "--profile", help="Print the time spent per phase to stderr", is_flag=True
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="Format of the --profile output",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_format: str):
+    if profile:
+        from artofmemory import profile as profiling
+
+        profiling.enable()
+        if profile_format == "json":
+            formatter = profiling.format_json
+        else:
+            formatter = profiling.format_table
+        ctx.call_on_close(lambda: click.echo(formatter(profiling.report()), err=True))
 
 
 @cli.command("missing")
@@ -19,6 +43,8 @@ def cli():
 @click.argument("choices", nargs=-1)
 def missing_support(choices, explain: bool, say: bool, bible: bool):
     """Play guessing game of what is missing"""
+    from artofmemory import missing
+
     if explain:
         click.echo(missing.explain())
 
@@ -33,6 +59,8 @@ def missing_support(choices, explain: bool, say: bool, bible: bool):
 @cli.command("card")
 def print_random_card():
     """Show a random card"""
+    from artofmemory import cards
+
     cards.random_card()
 
 
@@ -48,6 +76,8 @@ def print_random_card():
 )
 def person_action_object(config_file, explain: bool, quiz: bool):
     """Test out your Person Action Object (PAO) knowledge"""
+    from artofmemory import pao
+
     if explain:
         click.echo(pao.explain())
 
@@ -60,45 +90,432 @@ def person_action_object(config_file, explain: bool, quiz: bool):
         pao.basic_quiz(fname)
 
 
+index_file_option = click.option(
+    "--index-file",
+    metavar="<FILE>",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Memory map a packed index written by build-index",
+)
+
+
+db_option = click.option(
+    "--db",
+    "db_file",
+    metavar="<FILE>",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Answer from a SQLite database written by build-db",
+)
+
+
+config_option = click.option(
+    "--config-file",
+    metavar="<FILE>",
+    type=str,
+    help="Read your own major-system mappings from this file, see README",
+    default="~/.artofmemory.conf",
+)
+
+
+def pos_options(func):
+    """Add the part of speech filters to a words command"""
+    for part in ("adjectives", "verbs", "nouns"):
+        func = click.option(
+            f"--{part}", help=f"Filter words to be only {part}", is_flag=True
+        )(func)
+    return func
+
+
+limit_option = click.option(
+    "--limit",
+    metavar="INT",
+    type=click.IntRange(min=1),
+    help="Only show the best few words of every number",
+)
+
+
+def pos_mask(nouns: bool, verbs: bool, adjectives: bool) -> int:
+    """Combine the part of speech filters, words matching any of them are kept"""
+    from artofmemory import pos
+
+    return (
+        (pos.NOUN if nouns else 0)
+        | (pos.VERB if verbs else 0)
+        | (pos.ADJECTIVE if adjectives else 0)
+    )
+
+
+compact_option = click.option(
+    "--compact",
+    help="Use a packed copy of the cached index, a fraction of its memory",
+    is_flag=True,
+)
+
+stats_option = click.option(
+    "--stats", help="Print the memory taken up by the index to stderr", is_flag=True
+)
+
+
+def phonemes_major_system(
+    index_file: Optional[str],
+    compact: bool = False,
+    stats: bool = False,
+    db_file: Optional[str] = None,
+    config_file: Optional[str] = None,
+) -> "major.PhonemesMajorSystem":
+    """Create the phonemes engine, failing nicely on a stale or broken index file"""
+    from artofmemory import major
+
+    major_system = major.PhonemesMajorSystem(
+        index_file=index_file,
+        compact=compact,
+        db_file=db_file,
+        mapping=phonemes_mapping(config_file),
+    )
+    try:
+        index = major_system.index
+    except ValueError as exc:
+        param_hint = "--index-file" if index_file else "--db"
+        raise click.BadParameter(str(exc), param_hint=param_hint)
+    if stats:
+        click.get_current_context().call_on_close(lambda: print_stats(index))
+    return major_system
+
+
+def phonemes_mapping(config_file: Optional[str]) -> Optional[Dict[int, List[str]]]:
+    """Read the user's phoneme mapping, None keeps the default one"""
+    from artofmemory import major
+
+    if not config_file:
+        return None
+    try:
+        return major.read_mapping(
+            config_file, major.PHONEMES_SECTION, major.PhonemesMajorSystem.MAPPING
+        )
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--config-file")
+
+
+def letters_mapping(config_file: Optional[str]) -> Optional[Dict[int, List[str]]]:
+    """Read the user's letter mapping, None keeps the default one"""
+    from artofmemory import major
+
+    if not config_file:
+        return None
+    try:
+        return major.read_mapping(
+            config_file, major.LETTERS_SECTION, major.NaiveMajorSystem.MAPPING
+        )
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--config-file")
+
+
+def print_stats(index) -> None:
+    """Report the size of the index and the peak memory of the whole process"""
+    import resource
+
+    # Linux reports the peak resident set size in KiB, macOS in bytes
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    click.echo(
+        f"{type(index).__name__}: {len(index)} words, "
+        f"{index.memory_usage() / 2**20:.1f} MiB, "
+        f"peak process memory {peak_rss / 2**20:.1f} MiB",
+        err=True,
+    )
+
+
+socket_option = click.option(
+    "--socket",
+    "socket_path",
+    metavar="<FILE>",
+    type=click.Path(dir_okay=False),
+    help="Unix socket of the serve command (default: per user runtime directory)",
+)
+
+
+def words_major_system(
+    index_file: Optional[str],
+    client: bool,
+    socket_path: Optional[str],
+    compact: bool = False,
+    stats: bool = False,
+    db_file: Optional[str] = None,
+    config_file: Optional[str] = None,
+) -> "major.MajorSystem":
+    """Use the serve command's engine when asked to and reachable, else our own"""
+    if client:
+        from artofmemory import server
+
+        try:
+            return server.MajorSystemClient(socket_path)
+        except OSError as exc:
+            click.secho(
+                f"No server, looking words up locally: {exc}", fg="red", err=True
+            )
+    return phonemes_major_system(index_file, compact, stats, db_file, config_file)
+
+
 @cli.command("words")
 @click.option("--quiz", help="Quiz how well you know things", is_flag=True)
 @click.option("--explain", help="Include explanation", is_flag=True)
-@click.option("--nouns", help="Filter words to be only nouns", is_flag=True)
+@pos_options
+@limit_option
+@click.option(
+    "--segment", help="Split long numbers into a sequence of words", is_flag=True
+)
+@click.option(
+    "--from-file",
+    metavar="<FILE>",
+    type=click.File("r"),
+    help="Convert every word of the file ('-' for stdin) to its number",
+)
+@click.option(
+    "--stdin",
+    "from_stdin",
+    help="Read numbers and words from stdin, one per line, instead of arguments",
+    is_flag=True,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "jsonl"]),
+    default="text",
+    show_default=True,
+    help="Print numbers and words as text or as one JSON record per line",
+)
+@index_file_option
+@db_option
+@compact_option
+@stats_option
+@click.option("--client", help="Ask a running serve command", is_flag=True)
+@socket_option
+@config_option
 @click.argument("numbers", nargs=-1)
-def major_system_words(numbers, nouns: bool, explain: bool, quiz: bool):
+def major_system_words(
+    numbers,
+    config_file: str,
+    db_file: Optional[str],
+    stats: bool,
+    compact: bool,
+    socket_path: Optional[str],
+    client: bool,
+    index_file: Optional[str],
+    output_format: str,
+    from_stdin: bool,
+    from_file: Optional[TextIO],
+    segment: bool,
+    limit: Optional[int],
+    nouns: bool,
+    verbs: bool,
+    adjectives: bool,
+    explain: bool,
+    quiz: bool,
+):
     """Print out a possible words that match given number(s)"""
+    from artofmemory import major
+
     if explain:
         click.echo(major.explain())
 
     if quiz:
-        major.basic_quiz()
-    elif numbers:
-        major.print_number_words(numbers, nouns_only=nouns)
+        major_system = words_major_system(
+            index_file, client, socket_path, compact, stats, db_file, config_file
+        )
+        major.basic_quiz(major_system=major_system)
+    elif from_file:
+        major_system = words_major_system(
+            index_file, client, socket_path, compact, stats, db_file, config_file
+        )
+        words = (word for line in from_file for word in line.split())
+        major.print_words_major(words, major_system=major_system)
+    elif numbers or from_stdin:
+        major_system = words_major_system(
+            index_file, client, socket_path, compact, stats, db_file, config_file
+        )
+        if from_stdin:
+            stdin = click.get_text_stream("stdin")
+            numbers = (line.strip() for line in stdin if line.strip())
+        mask = pos_mask(nouns, verbs, adjectives)
+
+        if segment:
+            major.print_number_segments(numbers, major_system=major_system)
+        elif output_format == "jsonl":
+            major.print_number_word_records(numbers, major_system, mask, limit)
+        else:
+            # Look the numbers up a batch at a time to read stdin lazily
+            for batch in major.batched(numbers, 1000):
+                major.print_number_words(
+                    batch, major_system=major_system, pos_mask=mask, limit=limit
+                )
+
+
+@cli.command("serve")
+@index_file_option
+@db_option
+@compact_option
+@socket_option
+@config_option
+def serve(
+    config_file: str,
+    socket_path: Optional[str],
+    compact: bool,
+    db_file: Optional[str],
+    index_file: Optional[str],
+):
+    """Keep the words engine loaded, answering words --client over a socket"""
+    from artofmemory import server
+
+    path = socket_path or server.default_socket_path()
+    major_system = phonemes_major_system(
+        index_file, compact, db_file=db_file, config_file=config_file
+    )
+    click.echo(f"Serving on {path}, press Ctrl-C to stop", err=True)
+    try:
+        server.serve(path, major_system)
+    except OSError as exc:
+        raise click.ClickException(str(exc))
+
+
+@cli.command("build-index")
+@config_option
+@click.argument("path", type=click.Path(dir_okay=False))
+def build_index(path: str, config_file: str):
+    """Write a packed index that words commands can share via --index-file"""
+    from artofmemory import major
+
+    mapping = phonemes_mapping(config_file)
+    major.PhonemesMajorSystem(mapping=mapping).write_index_file(path)
+    click.echo(f"Wrote {path}")
+
+
+@cli.command("build-db")
+@config_option
+@click.argument("path", type=click.Path(dir_okay=False))
+def build_db(path: str, config_file: str):
+    """Write the dictionary to a SQLite database that words commands can use via --db"""
+    from artofmemory import major
+
+    mapping = phonemes_mapping(config_file)
+    major.PhonemesMajorSystem(mapping=mapping).write_db(
+        path, letters_mapping(config_file)
+    )
+    click.echo(f"Wrote {path}")
 
 
 @cli.command()
-@click.option("--org-mode", help="Make the output more org-mode friendly", is_flag=True)
-@click.option("--nouns", help="Filter words to be only nouns", is_flag=True)
-@click.option("--max", "max_", help="Maximum number", metavar="INT", default=100)
+@click.option("--org-mode", help="Same as --format org", is_flag=True)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["text", "org", "markdown", "html", "csv", "json", "anki"]),
+    default="text",
+    show_default=True,
+    help="Format of the summary, anki is tab separated text Anki imports as notes",
+)
+@pos_options
+@limit_option
+@click.option(
+    "--max",
+    "max_",
+    help="Maximum number, 100 or 10^width by default",
+    metavar="INT",
+    type=int,
+)
 @click.option("--min", "min_", help="Minimum number", metavar="INT", default=0)
-def words_summary(min_: int, max_: int, nouns: bool, org_mode: bool):
+@click.option(
+    "--width",
+    help="Zero pad every number to this many digits, instead of 0-9 followed by 00-99",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--output",
+    "-o",
+    help="Write the summary to this file instead of stdout",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--split-every",
+    help="Start a new --output file every this many numbers, named after its range",
+    metavar="K",
+    type=click.IntRange(min=1),
+)
+@index_file_option
+@db_option
+@compact_option
+@stats_option
+@config_option
+@click.option(
+    "--jobs",
+    "-j",
+    help="Look up words in this many worker processes",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+def words_summary(
+    jobs: int,
+    config_file: str,
+    stats: bool,
+    compact: bool,
+    db_file: Optional[str],
+    index_file: Optional[str],
+    split_every: Optional[int],
+    output: Optional[str],
+    width: Optional[int],
+    min_: int,
+    max_: Optional[int],
+    limit: Optional[int],
+    nouns: bool,
+    verbs: bool,
+    adjectives: bool,
+    output_format: str,
+    org_mode: bool,
+):
     """Show a large summary of words defaulting from 00 -> 99"""
-    input_numbers = []
-    # single digit numbers first
-    for n in range(min_, max_):
-        if -1 < n < 10:
-            input_numbers.append(str(n))
-    # then apply double digits
-    for n in range(min_, max_):
-        input_numbers.append(f"{n:02}")
-
-    if org_mode:
-        summary = major.OrgSummary(nouns_only=nouns)
+    from artofmemory import major
+
+    if split_every and not output:
+        raise click.UsageError("--split-every needs an --output file to split")
+    if max_ is None:
+        max_ = 10 ** (width or 2)
+    input_numbers = major.summary_numbers(min_, max_, width)
+
+    major_system = phonemes_major_system(
+        index_file, compact, stats, db_file, config_file
+    )
+    summary_class = major.SUMMARY_FORMATS["org" if org_mode else output_format]
+    summary = summary_class(
+        major_system=major_system,
+        pos_mask=pos_mask(nouns, verbs, adjectives),
+        limit=limit,
+        jobs=jobs,
+    )
+    if not output:
+        with summary.printer_object() as printer:
+            for number in input_numbers:
+                printer(number)
+    elif not split_every:
+        with open(output, "w", encoding="utf-8") as out:
+            with summary.printer_object(out) as printer:
+                for number in input_numbers:
+                    printer(number)
     else:
-        summary = major.Summary(nouns_only=nouns)
-    with summary.printer_object() as printer:
-        for number in input_numbers:
-            printer(number)
+        # Only one part's numbers are held at a time, each part is a complete summary
+        with summary.workers():
+            for part in major.batched(input_numbers, split_every):
+                path = split_path(output, part[0], part[-1])
+                with open(path, "w", encoding="utf-8") as out:
+                    with summary.printer_object(out) as printer:
+                        for number in part:
+                            printer(number)
+                click.echo(f"Wrote {path}", err=True)
+
+
+def split_path(path: str, first: str, last: str) -> str:
+    """Name a part of a split output file, e.g. summary.org -> summary-000-099.org"""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{first}-{last}{ext}"
 
 
 if __name__ == "__main__":
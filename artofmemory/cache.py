@@ -0,0 +1,65 @@
+"""Bounded least recently used cache that keeps count of how well it does."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+from . import profile
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(object):
+    """Remember up to maxsize values, forgetting the least recently used one first.
+
+    Like functools.lru_cache but for values computed by the caller, and counting
+    evictions as well. A maxsize of 0 disables caching. When profiling (see
+    artofmemory.profile), the counts are part of its report under the cache's name.
+    """
+
+    def __init__(self, maxsize: int, name: str = "cache"):
+        self.maxsize = maxsize
+        self.name = name
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Engines may be shared by the threads of the server
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        profile.track(name, self.info)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value of key, None when it is not cached."""
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache the (not None) value of key, evicting the oldest value when full."""
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self._values)
+        )
@@ -0,0 +1,293 @@
+"""SQLite form of the major-system dictionary, for persistent and ad-hoc queries.
+
+Besides answering the same queries as the other indexes, the database holds every
+word with all of its pronunciations, both its phonemes and naive major-system digits,
+syllables, part of speech flags and rank, e.g. the best nouns for 42 are
+
+    SELECT word FROM words WHERE digits = '42' AND pos & 1 ORDER BY rank LIMIT 5;
+
+and the words that can be said with an "NG" sound
+
+    SELECT DISTINCT word FROM pronunciations JOIN words ON words.id = word_id
+    WHERE ' ' || phonemes || ' ' LIKE '% NG %';
+
+Opening it reads no tables up front, SQLite pages in what each query needs.
+"""
+
+import itertools
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from . import profile
+from .index import (
+    BaseIndex,
+    MajorIndex,
+    atomic_write,
+    count_syllables,
+    phonemes_to_digits,
+    word_rank,
+)
+
+# Bump whenever the schema changes
+SCHEMA_VERSION = 2
+
+# Digit strings looked up per query by lookup_many()
+LOOKUP_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE words (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL UNIQUE,
+    -- Digits of the primary pronunciation, and of the word's letters (naive system)
+    digits TEXT NOT NULL,
+    naive TEXT NOT NULL,
+    syllables INTEGER NOT NULL,
+    -- Part of speech flags (see artofmemory.pos), NULL when built without WordNet
+    pos INTEGER,
+    -- 0 is the word easiest to picture, see artofmemory.index.word_rank()
+    rank INTEGER NOT NULL
+);
+-- Every pronunciation of a word in the CMU dictionary, variant 0 is the primary one
+CREATE TABLE pronunciations (
+    word_id INTEGER NOT NULL REFERENCES words (id),
+    variant INTEGER NOT NULL,
+    -- ARPAbet phonemes, e.g. 'F IH1 NG G ER0'
+    phonemes TEXT NOT NULL,
+    digits TEXT NOT NULL,
+    PRIMARY KEY (word_id, variant)
+) WITHOUT ROWID;
+-- The words of every digit string best first, once however many pronunciations match
+CREATE TABLE buckets (
+    digits TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    word_id INTEGER NOT NULL REFERENCES words (id),
+    PRIMARY KEY (digits, position)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX pronunciations_digits ON pronunciations (digits);
+CREATE INDEX words_digits ON words (digits, rank);
+CREATE INDEX words_naive ON words (naive, rank);
+CREATE INDEX words_rank ON words (rank);
+"""
+
+
+class SqliteIndex(BaseIndex):
+    """Query a major-system database written by .write()"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._db = connection
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        if meta.get("schema") != str(SCHEMA_VERSION):
+            raise ValueError(f"Unsupported database schema {meta.get('schema')}")
+        self.key = meta["key"]
+        self._has_pos = meta["has_pos"] == "1"
+        self._max_digits: Optional[int] = None
+
+    @classmethod
+    def open(cls, path: str, key: Optional[str] = None) -> "SqliteIndex":
+        """Open the database at path read-only.
+
+        When key is given, the database must have been written for that cache_key(),
+        otherwise it is out of date and a ValueError is raised.
+        """
+        with profile.phase("index load"):
+            if not os.path.isfile(path):
+                raise ValueError(f"No database at {path}")
+            # The server's threads share the engine, reading only is safe
+            connection = sqlite3.connect(
+                f"file:{path}?mode=ro", uri=True, check_same_thread=False
+            )
+            try:
+                db = cls(connection)
+            except (sqlite3.Error, KeyError) as exc:
+                connection.close()
+                raise ValueError(f"{path} is not a major-system database: {exc}")
+        if key is not None and db.key != key:
+            db.close()
+            raise ValueError(f"Database {path} is stale, please rebuild it")
+        return db
+
+    @staticmethod
+    def write(
+        index: MajorIndex,
+        path: str,
+        key: str,
+        naive_digits: Dict[str, str],
+        pronunciations: Dict[str, List[str]],
+    ) -> None:
+        """Write the index along with the naive digits of every word to path.
+
+        pronunciations holds the phonemes of every pronunciation of the words, see
+        cmu_pronunciations(), which are encoded with the index's own phonemes2num.
+        The database is built aside and then replaces path in one go, so concurrent
+        readers never see it half done.
+        """
+        if index.phonemes2num is None:
+            raise ValueError(
+                "The index does not know the phoneme mapping it was built with"
+            )
+        syllables = {
+            word: (
+                count_syllables(pronunciations[word][0])
+                if word in pronunciations
+                else 0
+            )
+            for word in index.word_digits
+        }
+        words = sorted(index.word_digits, key=lambda w: word_rank(w, syllables[w]))
+        word_ids = {word: i for i, word in enumerate(words)}
+        word_pos = index.word_pos
+        phonemes2num = index.phonemes2num
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_path = os.path.join(tmp_dir, "major.db")
+            with profile.phase("database build"):
+                db = sqlite3.connect(tmp_path)
+                try:
+                    db.executescript(SCHEMA)
+                    db.executemany(
+                        "INSERT INTO meta VALUES (?, ?)",
+                        [
+                            ("schema", str(SCHEMA_VERSION)),
+                            ("key", key),
+                            ("has_pos", "1" if word_pos is not None else "0"),
+                        ],
+                    )
+                    db.executemany(
+                        "INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            (
+                                i,
+                                word,
+                                index.word_digits[word],
+                                naive_digits.get(word, ""),
+                                syllables[word],
+                                None if word_pos is None else word_pos.get(word, 0),
+                                i,
+                            )
+                            for i, word in enumerate(words)
+                        ),
+                    )
+                    db.executemany(
+                        "INSERT INTO pronunciations VALUES (?, ?, ?, ?)",
+                        (
+                            (word_ids[word], variant, phonemes, digits)
+                            for word in words
+                            for variant, phonemes in enumerate(
+                                pronunciations.get(word, [])
+                            )
+                            for digits in [phonemes_to_digits(phonemes, phonemes2num)]
+                        ),
+                    )
+                    db.executemany(
+                        "INSERT INTO buckets VALUES (?, ?, ?)",
+                        (
+                            (digits, position, word_ids[word])
+                            for digits, bucket in index.digit_words.items()
+                            for position, word in enumerate(bucket)
+                        ),
+                    )
+                    db.executescript(INDEXES)
+                    db.commit()
+                    db.execute("ANALYZE")
+                finally:
+                    db.close()
+            with open(tmp_path, "rb") as src, atomic_write(path) as fh:
+                shutil.copyfileobj(src, fh)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def memory_usage(self) -> int:
+        (pages,) = self._db.execute("PRAGMA page_count").fetchone()
+        (page_size,) = self._db.execute("PRAGMA page_size").fetchone()
+        return pages * page_size
+
+    def __len__(self) -> int:
+        (count,) = self._db.execute("SELECT COUNT(*) FROM words").fetchone()
+        return count
+
+    def lookup(self, digits: str, limit: Optional[int] = None) -> List[str]:
+        rows = self._db.execute(
+            "SELECT word FROM buckets JOIN words ON words.id = word_id"
+            " WHERE buckets.digits = ? ORDER BY position LIMIT ?",
+            (digits, -1 if limit is None else limit),
+        )
+        return [word for (word,) in rows]
+
+    def lookup_many(
+        self, keys: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        # One query per chunk of keys, within the oldest SQLite's 999 parameters
+        found: Dict[str, List[str]] = {key: [] for key in keys}
+        remaining = iter(found)
+        within_limit = "" if limit is None else f" AND position < {int(limit)}"
+        while True:
+            chunk = list(itertools.islice(remaining, LOOKUP_CHUNK_SIZE))
+            if not chunk:
+                break
+            rows = self._db.execute(
+                "SELECT buckets.digits, word FROM buckets"
+                " JOIN words ON words.id = word_id"
+                f" WHERE buckets.digits IN ({', '.join('?' * len(chunk))})"
+                f"{within_limit} ORDER BY buckets.digits, position",
+                chunk,
+            )
+            for digits, word in rows:
+                found[digits].append(word)
+        return found
+
+    def digits_for(self, word: str) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT digits FROM words WHERE word = ?", (word.lower(),)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def digits_all(self, word: str) -> List[str]:
+        rows = self._db.execute(
+            "SELECT pronunciations.digits FROM words JOIN pronunciations"
+            " ON word_id = words.id WHERE word = ? ORDER BY variant",
+            (word.lower(),),
+        )
+        # Several pronunciations often share their digits
+        return list(dict.fromkeys(digits for (digits,) in rows))
+
+    @property
+    def has_pos_flags(self) -> bool:
+        return self._has_pos
+
+    def pos_flags(self, word: str) -> int:
+        if not self._has_pos:
+            return super().pos_flags(word)
+        row = self._db.execute(
+            "SELECT pos FROM words WHERE word = ?", (word,)
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        # ":" sorts right after "9", so this is every digit string starting with prefix
+        rows = self._db.execute(
+            "SELECT DISTINCT digits FROM buckets"
+            " WHERE digits >= ? AND digits < ? ORDER BY digits",
+            (prefix, prefix + ":"),
+        )
+        for (digits,) in rows:
+            yield digits
+
+    @property
+    def max_digits(self) -> int:
+        if self._max_digits is None:
+            (longest,) = self._db.execute(
+                "SELECT MAX(LENGTH(digits)) FROM buckets"
+            ).fetchone()
+            self._max_digits = longest or 0
+        return self._max_digits
@@ -0,0 +1,706 @@
+"""Lookup tables for the Major system derived from the CMU pronouncing dictionary."""
+
+import bisect
+import fnmatch
+import glob
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import pickle
+import sys
+import tempfile
+from contextlib import contextmanager
+from importlib.metadata import PackageNotFoundError, version
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from . import pos, profile
+from .data.words import COMMON_WORDS_EN
+
+# Bump whenever the layout of the cached tables changes
+CACHE_VERSION = 5
+
+# Built indexes are shared by every engine in the process using the same mapping
+_INDEXES: Dict[Tuple[Tuple[str, int], ...], "MajorIndex"] = {}
+
+
+_COMMON_WORDS = frozenset(word.lower() for word in COMMON_WORDS_EN)
+
+
+def is_common_word(word: str) -> bool:
+    """Whether the word is one of the most common English words."""
+    return word in _COMMON_WORDS
+
+
+def word_rank(word: str, syllables: int) -> Tuple[bool, bool, int, int, str]:
+    """Sort key putting the words easiest to picture first.
+
+    Common words come first, then plain words before ones with punctuation, then
+    fewer syllables and shorter spellings.
+    """
+    return (not is_common_word(word), not word.isalpha(), syllables, len(word), word)
+
+
+def count_syllables(phonemes: str) -> int:
+    """Count the syllables of a space separated phoneme string."""
+    # Only vowels carry a stress marker, a single digit
+    return sum(map(phonemes.count, "012"))
+
+
+def cmu_pronunciations() -> Dict[str, List[str]]:
+    """Return the phonemes of every pronunciation of every CMU dictionary word.
+
+    The primary pronunciation of a word comes first.
+    """
+    with profile.phase("dictionary init"):
+        # Only needed on a cold cache, so keep it off the import path
+        import pronouncing
+
+        pronouncing.init_cmu()
+
+    pronunciations: Dict[str, List[str]] = {}
+    for word, phonemes in pronouncing.pronunciations:
+        pronunciations.setdefault(word, []).append(phonemes)
+    return pronunciations
+
+
+def phonemes_to_digits(phonemes: str, phonemes2num: Dict[str, int]) -> str:
+    """Convert a space separated phoneme string to its major-system digits."""
+    return "".join(
+        [str(phonemes2num[p]) for p in phonemes.split() if p in phonemes2num]
+    )
+
+
+def _package_version(name: str) -> str:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def cache_dir() -> str:
+    """Directory holding the on-disk index cache, following the XDG spec."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "artofmemory")
+
+
+def _umask() -> int:
+    # The only way to read the umask is to set it, so put it straight back
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+@contextmanager
+def atomic_write(path: str) -> Iterator[BinaryIO]:
+    """Write a file in place of path so concurrent readers never see it half done."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            yield fh
+        # mkstemp() creates the file 0600, give it the permissions of a regular file
+        os.chmod(tmp_path, 0o666 & ~_umask())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def dictionary_key() -> str:
+    """Identify the dictionary and cache layout an index is derived from.
+
+    Unlike cache_key() it does not depend on the phoneme mapping, indexes sharing it
+    can be remapped into one another (see MajorIndex.remap()).
+    """
+    source = json.dumps(
+        {
+            "cache": CACHE_VERSION,
+            "pronouncing": _package_version("pronouncing"),
+            "cmudict": _package_version("cmudict"),
+        }
+    )
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def cache_key(phonemes2num: Dict[str, int]) -> str:
+    """Identify an index by everything it is derived from.
+
+    Changing the phoneme mapping or upgrading pronouncing / cmudict yields a new key
+    and hence invalidates any previously cached index.
+    """
+    source = json.dumps(
+        {
+            "cache": CACHE_VERSION,
+            "mapping": sorted(phonemes2num.items()),
+            "pronouncing": _package_version("pronouncing"),
+            "cmudict": _package_version("cmudict"),
+        }
+    )
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+class BaseIndex(object):
+    """Answer major-system queries from a precomputed table of the CMU dictionary."""
+
+    def lookup(self, digits: str, limit: Optional[int] = None) -> List[str]:
+        """Return the words whose consonant sounds match the digits exactly.
+
+        Words come best first (see word_rank()), limit only returns the first few.
+        """
+        raise NotImplementedError
+
+    def lookup_many(
+        self, keys: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        """Return the words of every digit string, keyed by the digit string."""
+        return {key: self.lookup(key, limit) for key in keys}
+
+    def digits_for(self, word: str) -> Optional[str]:
+        """Return the digits of the word's primary pronunciation, if it is known."""
+        raise NotImplementedError
+
+    def digits_many(self, words: Iterable[str]) -> Iterator[str]:
+        """Yield the primary digits of every word, "" when the word is unknown."""
+        for word in words:
+            yield self.digits_for(word) or ""
+
+    def digits_all(self, word: str) -> List[str]:
+        """Return the distinct digits of all the word's pronunciations, primary first.
+
+        The word is listed by lookup() under each of them.
+        """
+        digits = self.digits_for(word)
+        return [] if digits is None else [digits]
+
+    @property
+    def has_pos_flags(self) -> bool:
+        """Whether part of speech flags were precomputed into the index."""
+        return False
+
+    def pos_flags(self, word: str) -> int:
+        """Return the part of speech flags (see artofmemory.pos) of the word.
+
+        Indexes without precomputed flags ask WordNet about the word instead.
+        """
+        return pos.lookup_flags(word)
+
+    def filter_pos(
+        self, words: Iterable[str], mask: int, limit: Optional[int] = None
+    ) -> List[str]:
+        """Only keep the words having any of the parts of speech in mask.
+
+        With a limit, the words after the first limit matches are never looked at.
+        """
+        pos_flags = self.pos_flags
+        matches = (word for word in words if pos_flags(word) & mask)
+        return list(itertools.islice(matches, limit))
+
+    @property
+    def max_digits(self) -> int:
+        """Length of the longest digit string any single word encodes."""
+        raise NotImplementedError
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes taken up by the tables of the index."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        """Number of distinct words in the index."""
+        raise NotImplementedError
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        """Yield the indexed digit strings starting with prefix, in sorted order."""
+        raise NotImplementedError
+
+    def keys_matching(self, pattern: str, prefix: str = "") -> Iterator[str]:
+        """Yield the indexed digit strings matching a wildcard pattern, in sorted order.
+
+        "?" stands for any single digit and "*" for any number of digits. The pattern
+        is walked one digit at a time like a trie, giving up on any prefix no key
+        starts with, so only the keys after a "*" are compared one by one.
+        """
+        if next(self.keys_with_prefix(prefix), None) is None:
+            return
+        if not pattern:
+            if self.lookup(prefix):
+                yield prefix
+        elif pattern[0] == "*":
+            start = len(prefix)
+            for key in self.keys_with_prefix(prefix):
+                if fnmatch.fnmatchcase(key[start:], pattern):
+                    yield key
+        elif pattern[0] == "?":
+            for digit in "0123456789":
+                yield from self.keys_matching(pattern[1:], prefix + digit)
+        else:
+            yield from self.keys_matching(pattern[1:], prefix + pattern[0])
+
+    def prefix_words(self, prefix: str) -> List[str]:
+        """Return the words whose digits start with prefix, shortest digits first."""
+        # Keys come in lexicographic order, 9400 before 941
+        keys = sorted(self.keys_with_prefix(prefix), key=lambda key: (len(key), key))
+        words = (w for key in keys for w in self.lookup(key))
+        # A word may be listed under several keys, one per pronunciation
+        return list(dict.fromkeys(words))
+
+    def longest_match(self, digits: str) -> Tuple[str, List[str]]:
+        """Return the longest leading digits a single word covers, with its words.
+
+        Only prefixes up to max_digits long need to be probed, so the cost depends on
+        the length of the query and not on the size of the dictionary.
+        """
+        for length in range(min(len(digits), self.max_digits), 0, -1):
+            words = self.lookup(digits[:length])
+            if words:
+                return digits[:length], words
+        return "", []
+
+
+class MajorIndex(BaseIndex):
+    """Inverted index of major-system digit strings to the words that encode them.
+
+    Every pronunciation in the CMU dictionary is reduced to its digits once, so that
+    finding the words for a number is a single dictionary lookup. The digits of the
+    first pronunciation of every word are kept as well for the reverse direction.
+    Only about one word in a hundred has other pronunciations with different digits,
+    those are kept apart in word_variants rather than giving every word a list.
+
+    The words of every digit string are sorted by word_rank() when the index is built,
+    so the best few words of any number are simply the first few.
+
+    Part of speech flags are optional, see add_pos_flags().
+    """
+
+    def __init__(
+        self,
+        digit_words: Dict[str, List[str]],
+        word_digits: Dict[str, str],
+        word_pos: Optional[Dict[str, int]] = None,
+        word_variants: Optional[Dict[str, List[str]]] = None,
+        phonemes2num: Optional[Dict[str, int]] = None,
+    ):
+        self.digit_words = digit_words
+        self.word_digits = word_digits
+        # Digits of the other pronunciations, when they differ from the primary one
+        self.word_variants = word_variants or {}
+        # Only words having any part of speech are listed
+        self.word_pos = word_pos
+        # Mapping the index was built with, needed to remap it to another one
+        self.phonemes2num = phonemes2num
+        self._max_digits: Optional[int] = None
+        self._sorted_keys: Optional[List[str]] = None
+
+    @classmethod
+    def build(cls, phonemes2num: Dict[str, int]) -> "MajorIndex":
+        """Build the index by walking every pronunciation of the CMU dictionary."""
+        with profile.phase("dictionary init"):
+            # Only needed on a cold cache, so keep it off the import path
+            import pronouncing
+
+            pronouncing.init_cmu()
+
+        digit_words: Dict[str, List[str]] = {}
+        word_digits: Dict[str, str] = {}
+        word_variants: Dict[str, List[str]] = {}
+        syllables: Dict[str, int] = {}
+        with profile.phase("index build"):
+            for word, phonemes in pronouncing.pronunciations:
+                digits = phonemes_to_digits(phonemes, phonemes2num)
+                primary = word_digits.setdefault(word, digits)
+                if word not in syllables:
+                    syllables[word] = count_syllables(phonemes)
+                if digits != primary:
+                    variants = word_variants.setdefault(word, [])
+                    if digits not in variants:
+                        variants.append(digits)
+
+                words = digit_words.setdefault(digits, [])
+                # Pronunciation variants of a word are adjacent, only record it once
+                if not words or words[-1] != word:
+                    words.append(word)
+
+            for words in digit_words.values():
+                words.sort(key=lambda word: word_rank(word, syllables[word]))
+
+        return cls(
+            digit_words,
+            word_digits,
+            word_variants=word_variants,
+            phonemes2num=dict(phonemes2num),
+        )
+
+    def remap(self, phonemes2num: Dict[str, int], lexicon: "Lexicon") -> "MajorIndex":
+        """Return the index for another phoneme mapping, without rebuilding it.
+
+        Only the words having a phoneme whose digit differs between the two mappings
+        are encoded again, and only the digit strings they leave or join are sorted
+        again. The result is the same as a full build with the other mapping.
+        """
+        if self.phonemes2num is None:
+            raise ValueError("Index does not record the mapping it was built with")
+        old = self.phonemes2num
+        changed = [
+            p for p in set(old) | set(phonemes2num) if old.get(p) != phonemes2num.get(p)
+        ]
+
+        digit_words = dict(self.digit_words)
+        word_digits = dict(self.word_digits)
+        word_variants = dict(self.word_variants)
+        # Word lists are shared with this index until they need to change
+        touched: Dict[str, List[str]] = {}
+
+        def words_of(digits: str) -> List[str]:
+            if digits not in touched:
+                touched[digits] = digit_words[digits] = list(
+                    digit_words.get(digits, [])
+                )
+            return touched[digits]
+
+        affected = lexicon.pronunciations(changed)
+        for word, pronunciations in affected.items():
+            for digits in [word_digits[word]] + word_variants.pop(word, []):
+                words_of(digits).remove(word)
+            primary, *variants = dict.fromkeys(
+                phonemes_to_digits(phonemes, phonemes2num)
+                for phonemes in pronunciations
+            )
+            word_digits[word] = primary
+            if variants:
+                word_variants[word] = variants
+            for digits in [primary] + variants:
+                words_of(digits).append(word)
+
+        for digits, words in touched.items():
+            if words:
+                words.sort(key=lexicon.rank.__getitem__)
+            else:
+                del digit_words[digits]
+
+        return MajorIndex(
+            digit_words, word_digits, self.word_pos, word_variants, dict(phonemes2num)
+        )
+
+    @staticmethod
+    def read_header(path: str) -> Dict[str, Any]:
+        """Return the dictionary_key() and mapping of an index written with .save()"""
+        with open(path, "rb") as fh:
+            header = pickle.load(fh)
+        if not isinstance(header, dict):
+            raise ValueError(f"{path} has no index header")
+        return header
+
+    @classmethod
+    def load(cls, path: str) -> "MajorIndex":
+        """Read an index previously written with .save()"""
+        with profile.phase("index load"), open(path, "rb") as fh:
+            header = pickle.load(fh)
+            digit_words, word_digits, word_pos, word_variants = pickle.load(fh)
+        return cls(digit_words, word_digits, word_pos, word_variants, header["mapping"])
+
+    def save(self, path: str) -> None:
+        """Write the index so that it can be read back with .load()
+
+        A small header comes first, so .read_header() tells what an index is for
+        without reading its tables.
+        """
+        with profile.phase("index save"), atomic_write(path) as fh:
+            header = {"dictionary": dictionary_key(), "mapping": self.phonemes2num}
+            pickle.dump(header, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(
+                (self.digit_words, self.word_digits, self.word_pos, self.word_variants),
+                fh,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    def lookup(self, digits: str, limit: Optional[int] = None) -> List[str]:
+        return self.digit_words.get(digits, [])[:limit]
+
+    def digits_for(self, word: str) -> Optional[str]:
+        return self.word_digits.get(word.lower())
+
+    def digits_all(self, word: str) -> List[str]:
+        word = word.lower()
+        digits = self.word_digits.get(word)
+        if digits is None:
+            return []
+        return [digits] + self.word_variants.get(word, [])
+
+    def digits_many(self, words: Iterable[str]) -> Iterator[str]:
+        # Chained map() calls keep the whole loop out of the interpreter
+        return map(self.word_digits.get, map(str.lower, words), itertools.repeat(""))
+
+    @property
+    def has_pos_flags(self) -> bool:
+        return self.word_pos is not None
+
+    def pos_flags(self, word: str) -> int:
+        if self.word_pos is None:
+            return super().pos_flags(word)
+        return self.word_pos.get(word, 0)
+
+    @property
+    def max_digits(self) -> int:
+        if self._max_digits is None:
+            self._max_digits = max(map(len, self.digit_words), default=0)
+        return self._max_digits
+
+    def memory_usage(self) -> int:
+        return deep_getsizeof(
+            (self.digit_words, self.word_digits, self.word_pos, self.word_variants)
+        )
+
+    def __len__(self) -> int:
+        return len(self.word_digits)
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self.digit_words)
+        keys = self._sorted_keys
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            yield keys[i]
+
+
+class Lexicon(object):
+    """Every pronunciation of the CMU dictionary, as needed to remap an index.
+
+    It does not depend on the phoneme mapping. The pronunciations are kept in one
+    section per phoneme, holding the words having that phoneme in any pronunciation,
+    so that remapping a few phonemes only reads the words concerned. rank holds the
+    position of every word in the word_rank() order, for reordering digit strings.
+
+    A saved lexicon is memory mapped, sections are only unpickled once asked for.
+    """
+
+    def __init__(
+        self,
+        rank: Dict[str, int],
+        sections: Dict[str, Union[bytes, memoryview]],
+    ):
+        self.rank = rank
+        # Pickled {word: [phonemes of every pronunciation, primary first]} per phoneme
+        self._sections = sections
+
+    @classmethod
+    def build(cls) -> "Lexicon":
+        """Collect the pronunciations of the CMU dictionary."""
+        pronunciations = cmu_pronunciations()
+        with profile.phase("lexicon build"):
+            sections: Dict[str, Dict[str, List[str]]] = {}
+            syllables: Dict[str, int] = {}
+            for word, variants in pronunciations.items():
+                for phoneme in set(" ".join(variants).split()):
+                    section = sections.get(phoneme)
+                    if section is None:
+                        section = sections[phoneme] = {}
+                    section[word] = variants
+                syllables[word] = count_syllables(variants[0])
+
+            ranked = sorted(pronunciations, key=lambda w: word_rank(w, syllables[w]))
+            rank = {word: i for i, word in enumerate(ranked)}
+            pickled = {
+                phoneme: pickle.dumps(section, protocol=pickle.HIGHEST_PROTOCOL)
+                for phoneme, section in sections.items()
+            }
+        return cls(rank, pickled)
+
+    def pronunciations(self, phonemes: Iterable[str]) -> Dict[str, List[str]]:
+        """Return the pronunciations of the words having any of the phonemes."""
+        found: Dict[str, List[str]] = {}
+        for phoneme in phonemes:
+            if phoneme in self._sections:
+                found.update(pickle.loads(self._sections[phoneme]))
+        return found
+
+    @classmethod
+    def load(cls, path: str) -> "Lexicon":
+        """Memory map a lexicon previously written with .save()"""
+        with profile.phase("lexicon load"):
+            with open(path, "rb") as fh:
+                buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = pickle.load(buffer)
+            rank = pickle.load(buffer)
+            start = buffer.tell()
+            view = memoryview(buffer)[start:]
+            sections = {
+                phoneme: view[begin:end] for phoneme, (begin, end) in offsets.items()
+            }
+        return cls(rank, sections)
+
+    def save(self, path: str) -> None:
+        """Write the lexicon so that it can be read back with .load()
+
+        The offsets of the sections come first, followed by the ranks and then the
+        pickled sections themselves.
+        """
+        offsets: Dict[str, Tuple[int, int]] = {}
+        end = 0
+        for phoneme, section in self._sections.items():
+            offsets[phoneme] = (end, end + len(section))
+            end += len(section)
+        with atomic_write(path) as fh:
+            pickle.dump(offsets, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.rank, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            for section in self._sections.values():
+                fh.write(section)
+
+
+def load_lexicon() -> Lexicon:
+    """Return the lexicon of the dictionary, cached under cache_dir() once built."""
+    path = os.path.join(cache_dir(), f"lexicon-{dictionary_key()}.pickle")
+    try:
+        return Lexicon.load(path)
+    except Exception:
+        pass
+
+    lexicon = Lexicon.build()
+    try:
+        lexicon.save(path)
+    except OSError:
+        pass
+    return lexicon
+
+
+def deep_getsizeof(obj: Any) -> int:
+    """Size of obj and everything it contains, counting shared objects once."""
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
+
+
+def cache_path(phonemes2num: Dict[str, int], extension: str = "pickle") -> str:
+    """Path of a cached form of the index for the phoneme mapping."""
+    return os.path.join(cache_dir(), f"major-{cache_key(phonemes2num)}.{extension}")
+
+
+def add_pos_flags(index: MajorIndex, phonemes2num: Dict[str, int]) -> None:
+    """Precompute WordNet part of speech flags into the index and its cache file.
+
+    This is the only step loading WordNet, later processes read the flags back from
+    the cache along with the rest of the index.
+    """
+    with profile.phase("pos flags"):
+        index.word_pos = pos.wordnet_flags(index.word_digits)
+    try:
+        index.save(cache_path(phonemes2num))
+        # The compact copy (see packed.load_compact) is repacked with the flags
+        os.unlink(cache_path(phonemes2num, "idx"))
+    except OSError:
+        pass
+
+
+def _load_cached(phonemes2num: Dict[str, int]) -> MajorIndex:
+    path = cache_path(phonemes2num)
+    try:
+        return MajorIndex.load(path)
+    except Exception:
+        # Missing, truncated or foreign files alike, rebuilding is always safe
+        pass
+
+    # Switching to another mapping only re-encodes the words it changes
+    index = None
+    for base_path in _other_indexes(path):
+        try:
+            base = MajorIndex.load(base_path)
+        except Exception:
+            continue
+        lexicon = load_lexicon()
+        with profile.phase("index remap"):
+            index = base.remap(phonemes2num, lexicon)
+        break
+    if index is None:
+        index = MajorIndex.build(phonemes2num)
+
+    try:
+        index.save(path)
+    except OSError:
+        # A read-only or full cache directory only costs us the next cold start
+        pass
+    return index
+
+
+def _other_indexes(path: str) -> List[str]:
+    """Return the cached indexes of other mappings, most recently written first.
+
+    Files of older dictionary versions will not be read again and are removed.
+    """
+    current = os.path.splitext(path)[0]
+    dictionary = dictionary_key()
+    others: Dict[str, str] = {}
+    for other in glob.glob(os.path.join(cache_dir(), "major-*.pickle")):
+        stem = os.path.splitext(other)[0]
+        if stem == current:
+            continue
+        try:
+            header = MajorIndex.read_header(other)
+        except Exception:
+            continue
+        if header.get("dictionary") == dictionary and header.get("mapping"):
+            others[stem] = other
+
+    stale = glob.glob(os.path.join(cache_dir(), "major-*.*"))
+    stale += glob.glob(os.path.join(cache_dir(), "lexicon-*.pickle"))
+    for other in stale:
+        stem = os.path.splitext(other)[0]
+        if stem != current and stem not in others and dictionary not in stem:
+            try:
+                os.unlink(other)
+            except OSError:
+                pass
+
+    return sorted(others.values(), key=_mtime, reverse=True)
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def load_index(
+    phonemes2num: Dict[str, int], use_cache: bool = True, keep: bool = True
+) -> MajorIndex:
+    """Return the index for the phoneme mapping.
+
+    It is built at most once per process and, unless use_cache is False, persisted
+    under cache_dir() so later processes only need to read it back. With keep=False
+    the index is not held on to for later calls, for callers converting it right away.
+    """
+    key = tuple(sorted(phonemes2num.items()))
+    if key in _INDEXES:
+        return _INDEXES[key]
+
+    if use_cache:
+        index = _load_cached(phonemes2num)
+    else:
+        index = MajorIndex.build(phonemes2num)
+    if keep:
+        _INDEXES[key] = index
+    return index
@@ -1,14 +1,49 @@
+import csv
+import functools
+import html
+import os
+import io
 import itertools
+import json
 import random
 import re
+import sys
 import textwrap
-from contextlib import contextmanager
-from typing import Any, List, Optional, Set, Tuple
-
-import pronouncing
-from nltk.corpus import wordnet as wn
+from collections import deque
+from configparser import ConfigParser
+from configparser import Error as ConfigParserError
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
 
 from .data.words import COMMON_WORDS_EN
+from . import pos, profile
+from .cache import LRUCache
+from .db import SqliteIndex
+from .index import (
+    BaseIndex,
+    MajorIndex,
+    add_pos_flags,
+    cache_key,
+    cmu_pronunciations,
+    is_common_word,
+    load_index,
+)
+from .packed import PackedIndex, load_compact
+
+# Words whose major-system value each engine remembers by default
+WORD_CACHE_SIZE = 4096
 
 
 class MajorSystem(object):
@@ -51,9 +86,26 @@ class MajorSystem(object):
     def word_to_major(self, word: str) -> str:
         raise NotImplementedError
 
+    def word_to_major_all(self, word: str) -> List[str]:
+        """Return the values of every way of pronouncing the word, primary first."""
+        return [self.word_to_major(word)]
+
     def number_to_words(self, number: str) -> List[str]:
         raise NotImplementedError
 
+    def number_to_words_many(
+        self, numbers: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        """Return the possible word matches of every number, keyed by number.
+
+        With a limit, only that many words are returned per number.
+        """
+        return {number: self.number_to_words(number)[:limit] for number in numbers}
+
+    def words_to_major(self, words: Iterable[str]) -> Iterator[str]:
+        """Convert a stream of words, yielding the major-system value of each."""
+        return map(self.word_to_major, words)
+
 
 class PhonemesMajorSystem(MajorSystem):
     """An implementation of the major system that uses phonemes.
@@ -74,55 +126,238 @@ class PhonemesMajorSystem(MajorSystem):
         9: ["B", "P"],
     }
 
-    def __init__(self):
+    def __init__(
+        self,
+        index_file: Optional[str] = None,
+        compact: bool = False,
+        cache_size: int = WORD_CACHE_SIZE,
+        db_file: Optional[str] = None,
+        mapping: Optional[Dict[int, List[str]]] = None,
+    ):
+        if mapping is not None:
+            # A user's own digit -> phonemes, see read_mapping()
+            self.MAPPING = mapping
         # Create a reverse map for quick lookup
         self.phonemes2num = {}
         for num, phonemes in self.MAPPING.items():
             for phoneme in phonemes:
                 self.phonemes2num[phoneme] = num
 
+        # Optional packed index (see .write_index_file()) to memory map
+        self.index_file = index_file
+        # Optional SQLite database (see .write_db()) to answer from
+        self.db_file = db_file
+        # Memory map a packed copy of the cached index instead of loading its dictionaries
+        self.compact = compact
+        self._index: Optional[BaseIndex] = None
+        # Recently converted words, see word_cache.info() for how well it does
+        self.word_cache = LRUCache(cache_size, "phonemes word_to_major")
+
+    @property
+    def index(self) -> BaseIndex:
+        """Digit index of the CMU dictionary, opened or built on first use."""
+        if self._index is None:
+            if self.index_file:
+                key = cache_key(self.phonemes2num)
+                self._index = PackedIndex.open(self.index_file, key=key)
+            elif self.db_file:
+                key = cache_key(self.phonemes2num)
+                self._index = SqliteIndex.open(self.db_file, key=key)
+            elif self.compact:
+                self._index = load_compact(self.phonemes2num)
+            else:
+                self._index = load_index(self.phonemes2num)
+        return self._index
+
+    def filter_pos(
+        self, words: Iterable[str], mask: int, limit: Optional[int] = None
+    ) -> List[str]:
+        """Only keep the (first limit) words having any of the parts of speech in mask.
+
+        The first use precomputes flags for the whole dictionary into the cached index,
+        afterwards filtering needs no WordNet at all. See pos for the mask values.
+        """
+        index = self.index
+        if not index.has_pos_flags:
+            if isinstance(index, MajorIndex):
+                add_pos_flags(index, self.phonemes2num)
+            elif self.compact and not self.index_file and not self.db_file:
+                # The cached packed copy lacks them, flag the index it was packed
+                # from (which drops the copy) and map a repacked one
+                full = load_index(self.phonemes2num, keep=False)
+                if not full.has_pos_flags:
+                    add_pos_flags(full, self.phonemes2num)
+                index = self._index = load_compact(self.phonemes2num)
+        with profile.phase("filter"):
+            return index.filter_pos(words, mask, limit)
+
+    def _index_to_write(self) -> MajorIndex:
+        """Return the cached index, with part of speech flags when WordNet has them."""
+        index = load_index(self.phonemes2num)
+        if not index.has_pos_flags:
+            try:
+                add_pos_flags(index, self.phonemes2num)
+            except LookupError:
+                # No WordNet data, the written index will ask WordNet per word instead
+                pass
+        return index
+
+    def write_index_file(self, path: str) -> None:
+        """Write the index in the packed format many processes can memory map."""
+        PackedIndex.write(self._index_to_write(), path, cache_key(self.phonemes2num))
+
+    def write_db(
+        self, path: str, letter_mapping: Optional[Dict[int, List[str]]] = None
+    ) -> None:
+        """Write the whole dictionary to a SQLite database for ad-hoc queries too.
+
+        Along with the index it holds the phonemes of every pronunciation and the
+        naive major-system digits of every word, see NaiveMajorSystem for the
+        letter_mapping.
+        """
+        index = self._index_to_write()
+        words = list(index.word_digits)
+        naive = NaiveMajorSystem(0, letter_mapping).words_to_major(words)
+        SqliteIndex.write(
+            index,
+            path,
+            cache_key(self.phonemes2num),
+            dict(zip(words, naive)),
+            cmu_pronunciations(),
+        )
+
     def word_to_major(self, word: str) -> str:
         """Convert word to phonetic major-system value."""
-        phonemes = pronouncing.phones_for_word(word)
-        if not phonemes:
-            return ""
+        value = self.word_cache.get(word)
+        if value is None:
+            value = self.index.digits_for(word) or ""
+            self.word_cache.put(word, value)
+        return value
 
-        return "".join(
-            [
-                str(self.phonemes2num[p])
-                for p in phonemes[0].split()
-                if p in self.phonemes2num
-            ]
-        )
+    def word_to_major_all(self, word: str) -> List[str]:
+        """Convert word to the value of each of its pronunciations.
 
-    def number_to_words(self, number: str) -> List[str]:
-        """Return a list of possible word matches for the given number."""
-        # pronouncing.pronunciations is a list
-        # pronouncing.lookup is a dict mapping of the word to the phonemes
+        e.g. "often" => ["82", "812"], with a silent and with a spoken "t"
+        number_to_words() lists the word under every one of them.
+        """
+        return self.index.digits_all(word)
 
+    def words_to_major(self, words: Iterable[str]) -> Iterator[str]:
+        """Convert a stream of words straight from the index table."""
+        return self.index.digits_many(words)
+
+    def number_to_words(self, number: str, limit: Optional[int] = None) -> List[str]:
+        """Return a list of possible word matches for the given number, best first.
+
+        Words are ranked when the index is built, so a limit only costs its own size.
+        """
         # 83 should match "FM" and "VM"
+        index = self.index
+        with profile.phase("query"):
+            return index.lookup(_digits(number), limit)
+
+    def number_to_words_many(
+        self, numbers: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        """Return the possible word matches of every number in a single index sweep."""
+        numbers = list(numbers)
+        index = self.index
+        with profile.phase("query"):
+            found = index.lookup_many({_digits(number) for number in numbers}, limit)
+            return {number: list(found[_digits(number)]) for number in numbers}
+
+    def prefix_words(self, digits: str) -> List[str]:
+        """Return the words whose major-system value starts with the digits."""
+        return self.index.prefix_words(digits)
+
+    def pattern_words(
+        self, pattern: str, limit: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Yield (digits, words) for every major-system value matching the pattern.
+
+        "?" stands for any single digit and "*" for any number of digits, e.g. "9?3"
+        or "42*". Matches are found one at a time, in sorted order of their digits.
+        """
+        index = self.index
+        for digits in index.keys_matching(_pattern(pattern)):
+            yield digits, index.lookup(digits, limit)
 
-        # FIXME: This whole implementation is basically a special form of
-        #        pronouncing.search() and hence needs to call .init_cmu(). Ideally this
-        #        detail is not needed.
-        pronouncing.init_cmu()
+    def longest_match(self, digits: str) -> Tuple[str, List[str]]:
+        """Return the longest front part of the digits a single word encodes.
 
-        pattern = "^"
-        for n in map(int, re.findall(r"\d", number)):
-            pattern += f"({'|'.join(self.MAPPING[n])})"
-        pattern += "$"
+        e.g. 94120 => ("9412", [...words for 9412...])
+        """
+        return self.index.longest_match(digits)
 
-        matcher = re.compile(pattern)
+    def segment(self, number: str) -> List[Tuple[str, str]]:
+        """Split a long number into a sequence of (digits, word) pairs.
 
-        matches = []
-        for word, phonemes in pronouncing.pronunciations:
-            consts = "".join(
-                filter(lambda p: p in self.phonemes2num.keys(), phonemes.split())
-            )
-            if matcher.match(consts):
-                matches.append(word)
+        Uses dynamic programming over the digit index: the fewest words win and ties go
+        to the segmentation using the most common words. Each chunk gets the best of
+        its words, the first one number_to_words() lists. Every position only tries the
+        chunk lengths a single word can cover, so this is linear in the number length.
 
-        return matches
+        Raises ValueError when there are no digits or they cannot be covered by words.
+        """
+        digits = _digits(number)
+        if not digits:
+            raise ValueError(f"No digits to segment in {number!r}")
+        n = len(digits)
+        max_digits = self.index.max_digits
+
+        # (1 when uncommon, word) of the best word of a chunk, None without any
+        chunk_cache: Dict[str, Optional[Tuple[int, str]]] = {}
+
+        def chunk_word(chunk: str) -> Optional[Tuple[int, str]]:
+            if chunk not in chunk_cache:
+                words = self.index.lookup(chunk, 1)
+                chunk_cache[chunk] = (
+                    (0 if is_common_word(words[0]) else 1, words[0]) if words else None
+                )
+            return chunk_cache[chunk]
+
+        # best[i] is the (word count, uncommon words) cost of segmenting digits[i:]
+        # and choice[i] the length and word of the first chunk to get it
+        best: List[Optional[Tuple[int, int]]] = [None] * n + [(0, 0)]
+        choice: List[Tuple[int, str]] = [(0, "")] * n
+        for i in range(n - 1, -1, -1):
+            for length in range(1, min(max_digits, n - i) + 1):
+                rest = best[i + length]
+                end = i + length
+                found = chunk_word(digits[i:end])
+                if rest is None or found is None:
+                    continue
+                cost = (rest[0] + 1, rest[1] + found[0])
+                if best[i] is None or cost < best[i]:
+                    best[i] = cost
+                    choice[i] = (length, found[-1])
+
+        if best[0] is None:
+            raise ValueError(f"No sequence of words matches {number}")
+
+        segments = []
+        i = 0
+        while i < n:
+            length, word = choice[i]
+            end = i + length
+            segments.append((digits[i:end], word))
+            i = end
+        return segments
+
+
+def _digits(number: str) -> str:
+    """Only keep the digits of a number, e.g. 555-1234 => 5551234"""
+    return "".join(re.findall(r"\d", number))
+
+
+def _pattern(pattern: str) -> str:
+    """Only keep the digits and wildcards of a pattern, e.g. 555-12?? => 55512??"""
+    return "".join(re.findall(r"[\d?*]", pattern))
+
+
+def is_pattern(number: str) -> bool:
+    """Whether the number is a pattern for pattern_words(), e.g. 9?3 but not "what?"."""
+    return bool(re.fullmatch(r"[\d?*-]*[?*][\d?*-]*", number))
 
 
 class NaiveMajorSystem(MajorSystem):
@@ -144,23 +379,25 @@ class NaiveMajorSystem(MajorSystem):
         9: ["p", "b"],
     }
 
-    def __init__(self):
+    def __init__(
+        self,
+        cache_size: int = WORD_CACHE_SIZE,
+        mapping: Optional[Dict[int, List[str]]] = None,
+    ):
+        if mapping is not None:
+            # A user's own digit -> letters, see read_mapping()
+            self.MAPPING = mapping
         self.major_letters = list(itertools.chain(*self.MAPPING.values()))
+        self.compiled = compile_letter_mapping(self.MAPPING)
+        # Recently converted words, see word_cache.info() for how well it does
+        self.word_cache = LRUCache(cache_size, "naive word_to_major")
 
     def _regex_from_letter_mapping(self):
         """
         Given a dictionary of number to character mappings, return a regular
         expression that can be used to break it up
         """
-
-        all_letters = itertools.chain(*self.MAPPING.values())
-
-        sorted_letters = sorted(all_letters, key=lambda x: len(x), reverse=True)
-
-        # This will looks like '(th|ch|sh|k|....)
-        regex = "({})".format("|".join(sorted_letters))
-
-        return regex
+        return _letters_regex(self.MAPPING)
 
     def word_to_major(self, word: str) -> str:
         """Given a word, convert it to the major system.
@@ -170,21 +407,171 @@ class NaiveMajorSystem(MajorSystem):
         @param  word        Word to convert
         @returns    int     Integer value of given word
         """
-        regex = self._regex_from_letter_mapping()
-
-        value = ""
-        for piece in re.findall(regex, word):
-            for i, letters in self.MAPPING.items():
-                if piece.lower() in letters:
-                    value += str(i)
+        value = self.word_cache.get(word)
+        if value is None:
+            value = self.compiled.translate(word)
+            self.word_cache.put(word, value)
         return value
 
+    def words_to_major(self, words: Iterable[str]) -> Iterator[str]:
+        """Convert a stream of words with the compiled letter mapping."""
+        return map(self.compiled.translate, words)
+
+
+# Sections of a config file (see read_mapping()) overriding the default mappings
+PHONEMES_SECTION = "major phonemes"
+LETTERS_SECTION = "major letters"
+
+
+def read_mapping(
+    config_file: str, section: str, default: Dict[int, List[str]]
+) -> Dict[int, List[str]]:
+    """Return the default mapping, with the digits set in the config file replaced.
+
+    Schools of the major system disagree on a few sounds, e.g. with
+
+        [major phonemes]
+        2 = N
+        7 = K, G, NG
+
+    "NG" is a 7 rather than a 2. A sound listed for one digit is taken away from any
+    other digit, one listed for none is silent. Phonemes are those of the CMU
+    dictionary, a vowel without a stress (e.g. "ER") stands for all of its stresses.
+    The [major letters] section does the same for the letters of NaiveMajorSystem.
+
+    Only the section is read, the rest of the file (e.g. the [pao] one) may hold
+    anything.
+    """
+    config = ConfigParser()
+    try:
+        config.read_string(_config_section(config_file, section), config_file)
+    except ConfigParserError as exc:
+        raise ValueError(str(exc))
+    if not config.has_section(section):
+        return default
+
+    overrides: Dict[int, List[str]] = {}
+    for key, value in config.items(section):
+        if not (key.isdigit() and len(key) == 1):
+            raise ValueError(f"{config_file}: [{section}] {key} is not a digit")
+        sounds = [s.strip() for s in value.split(",") if s.strip()]
+        if section == PHONEMES_SECTION:
+            sounds = _cmu_phonemes(sounds, f"{config_file}: [{section}] {key}")
+        else:
+            sounds = [s.lower() for s in sounds]
+        overrides[int(key)] = sounds
+
+    moved = {sound for sounds in overrides.values() for sound in sounds}
+    mapping = {
+        num: [sound for sound in sounds if sound not in moved]
+        for num, sounds in default.items()
+    }
+    mapping.update(overrides)
+    return mapping
+
+
+def _config_section(config_file: str, section: str) -> str:
+    """Return the lines of the config file making up the section, if any."""
+    try:
+        with open(os.path.expanduser(config_file)) as fh:
+            lines = fh.readlines()
+    except OSError:
+        # Like ConfigParser.read(), a missing file is an empty one
+        return ""
+    found: List[str] = []
+    in_section = False
+    for line in lines:
+        header = ConfigParser.SECTCRE.match(line.strip())
+        if header:
+            in_section = header.group("header") == section
+        if in_section:
+            found.append(line)
+    return "".join(found)
+
+
+def _cmu_phonemes(sounds: List[str], where: str) -> List[str]:
+    """Check the sounds are CMU dictionary phonemes, adding the stresses of vowels."""
+    # Only needed for a user's own mapping, so keep it off the import path
+    import cmudict
+
+    symbols = set(cmudict.symbols())
+    phonemes: List[str] = []
+    for sound in map(str.upper, sounds):
+        if sound not in symbols:
+            raise ValueError(f"{where}: {sound} is not a CMU dictionary phoneme")
+        # The dictionary only has stressed vowels, e.g. "ER0" and "ER1" for "ER"
+        stressed = [sound + stress for stress in "012" if sound + stress in symbols]
+        phonemes.extend(stressed or [sound])
+    return phonemes
+
+
+def _letters_regex(mapping: Dict[int, List[str]]) -> str:
+    all_letters = itertools.chain(*mapping.values())
 
-def basic_quiz(use_letters: bool = False):
+    sorted_letters = sorted(all_letters, key=lambda x: len(x), reverse=True)
+
+    # This will looks like '(th|ch|sh|k|....)
+    regex = "({})".format("|".join(sorted_letters))
+
+    return regex
+
+
+class _DropUnmapped(dict):
+    """str.translate() table deleting every character it has no digit for."""
+
+    def __missing__(self, key: int) -> None:
+        # Remember the miss so the next occurrence is a plain dict hit
+        self[key] = None
+        return None
+
+
+class CompiledLetterMapping(object):
+    """A letter -> digit mapping prepared for translating many words.
+
+    Mappings of single letters (the default) translate with str.translate(), so no
+    Python level loop runs per character. Mappings including letter groups such as
+    "th" fall back to the precompiled regular expression.
+    """
+
+    def __init__(self, mapping: Dict[int, List[str]]):
+        self.letters2num = {
+            letter: str(num) for num, letters in mapping.items() for letter in letters
+        }
+        self.pattern = re.compile(_letters_regex(mapping))
+
+        self._table: Optional[_DropUnmapped] = None
+        if all(len(letter) == 1 for letter in self.letters2num):
+            self._table = _DropUnmapped(
+                {ord(letter): num for letter, num in self.letters2num.items()}
+            )
+
+    def translate(self, word: str) -> str:
+        """Return the major-system value of the word."""
+        if self._table is not None:
+            return word.translate(self._table)
+        return "".join([self.letters2num[p] for p in self.pattern.findall(word)])
+
+
+def compile_letter_mapping(mapping: Dict[int, List[str]]) -> CompiledLetterMapping:
+    """Compile the mapping, reusing the result for mappings seen before."""
+    key = tuple((num, tuple(letters)) for num, letters in sorted(mapping.items()))
+    return _compile_letter_mapping(key)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_letter_mapping(
+    key: Tuple[Tuple[int, Tuple[str, ...]], ...],
+) -> CompiledLetterMapping:
+    return CompiledLetterMapping({num: list(letters) for num, letters in key})
+
+
+def basic_quiz(
+    use_letters: bool = False, major_system: Optional[PhonemesMajorSystem] = None
+):
     """Quiz converting words to major numeric equivalent"""
     game = "letters" if use_letters else "words"
 
-    major_system = PhonemesMajorSystem()
+    major_system = major_system or PhonemesMajorSystem()
 
     words = COMMON_WORDS_EN
     correct = 0
@@ -197,7 +584,8 @@ def basic_quiz(use_letters: bool = False):
         major_value = major_system.word_to_major(word)
 
         try:
-            guess = input("{} => ".format(word))
+            with profile.phase("quiz"):
+                guess = input("{} => ".format(word))
         except (EOFError, KeyboardInterrupt):
             break
 
@@ -217,6 +605,10 @@ def explain() -> str:
     return "\n".join(map(lambda l: l.lstrip(), str(MajorSystem.__doc__).split("\n")))
 
 
+# Starts looking up the words of a batch of numbers, see Summary._lookups()
+_BatchLookup = Callable[[List[str]], "Future[Dict[str, List[str]]]"]
+
+
 class Summary(object):
     """Help print out a summary of the word mappings.
 
@@ -224,36 +616,191 @@ class Summary(object):
     pairings and it will print the information for you. Before the first pair, it can
     optionally provide a header and after you are done with the printer object, it can
     possibly print a footer.
-    """
 
-    def __init__(self, nouns_only: bool = False):
-        self._major = PhonemesMajorSystem()
+    Subclasses render other formats (see SUMMARY_FORMATS) by overriding _header(),
+    _render_batch() and _footer(). Every batch is rendered to a single string, so the
+    output stream gets one write per batch rather than one per number.
 
-        self._all_nouns: Optional[Set[Any]] = None
-        if nouns_only:
-            self._all_nouns = {x.name().split(".", 1)[0] for x in wn.all_synsets("n")}
+    With jobs > 1 the batches of numbers are looked up by that many worker processes,
+    each memory mapping the same packed index, while this process prints the results
+    in the order the numbers were given.
+    """
+
+    def __init__(
+        self,
+        nouns_only: bool = False,
+        major_system: Optional[PhonemesMajorSystem] = None,
+        pos_mask: int = 0,
+        limit: Optional[int] = None,
+        jobs: int = 1,
+    ):
+        self._major = major_system or PhonemesMajorSystem()
+        # Parts of speech (see pos) to filter words by, 0 keeps every word
+        self._pos_mask = pos_mask | (pos.NOUN if nouns_only else 0)
+        # Only print the best few words of every number
+        self._limit = limit
+        # Worker processes looking up words, 1 looks them up in this process
+        self._jobs = jobs
+        # Batch lookup shared by printer_object()s while in workers()
+        self._lookup: Optional[_BatchLookup] = None
+
+    def _words_for(self, numbers: List[str]) -> Dict[str, List[str]]:
+        """Look up the (filtered) words for a batch of numbers at once"""
+        return _summary_words(self._major, numbers, self._pos_mask, self._limit)
 
     def _header(self) -> str:
         """Provide opening, header information"""
-        return explain()
+        return explain() + "\n"
 
     def _footer(self) -> str:
         """Provide closing, footer information"""
-        return ""
+        return "\n"
+
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        """Render a batch of numbers along with their words"""
+        return "".join(
+            f"{number}: {', '.join(found[number])}\n\n" for number in numbers
+        )
+
+    # Numbers are looked up in batches of this size before being printed
+    batch_size = 100
+
+    @contextmanager
+    def _lookups(self):
+        """Provide a function starting the lookup of a batch, returning its future."""
+        if self._jobs <= 1:
+
+            def lookup(numbers: List[str]) -> "Future[Dict[str, List[str]]]":
+                future: "Future[Dict[str, List[str]]]" = Future()
+                future.set_result(self._words_for(numbers))
+                return future
+
+            yield lookup
+            return
+
+        index_file = getattr(self._major, "index_file", None)
+        db_file = getattr(self._major, "db_file", None)
+        if not index_file and not db_file:
+            # Pack (and flag) the index once up front, rather than in every worker
+            if self._pos_mask:
+                self._major.filter_pos([], self._pos_mask)
+            load_compact(self._major.phonemes2num)
+        with ProcessPoolExecutor(
+            self._jobs,
+            initializer=_init_summary_worker,
+            initargs=(index_file, db_file, self._major.MAPPING),
+        ) as pool:
+            yield functools.partial(
+                pool.submit,
+                _summary_worker_words,
+                pos_mask=self._pos_mask,
+                limit=self._limit,
+            )
 
     @contextmanager
-    def printer_object(self):
-        print(self._header())
+    def workers(self):
+        """Keep the worker processes (if any) running across several printer_object()s"""
+        with self._lookups() as lookup:
+            self._lookup = lookup
+            try:
+                yield self
+            finally:
+                self._lookup = None
+
+    @contextmanager
+    def printer_object(self, out: Optional[TextIO] = None):
+        """Print the summary of the numbers fed to the printer to out, stdout by default"""
+        out = out or sys.stdout
+        out.write(self._header())
+        # Numbers rendered so far, for formats separating them from the previous ones
+        self._rendered = 0
+
+        pending_numbers: List[str] = []
+        # Batches being looked up, printed first to last as their words come in
+        in_flight: Deque[Tuple[List[str], "Future[Dict[str, List[str]]]"]] = deque()
+        max_in_flight = 4 * self._jobs
+
+        def print_done(wait: bool = False) -> None:
+            while in_flight and (
+                wait or len(in_flight) > max_in_flight or in_flight[0][1].done()
+            ):
+                numbers, future = in_flight.popleft()
+                with profile.phase("query"):
+                    found = future.result()
+                with profile.phase("render"):
+                    out.write(self._render_batch(numbers, found))
+                self._rendered += len(numbers)
+
+        lookups = nullcontext(self._lookup) if self._lookup else self._lookups()
+        with lookups as lookup:
+
+            def submit_pending() -> None:
+                numbers = pending_numbers[:]
+                pending_numbers.clear()
+                in_flight.append((numbers, lookup(numbers)))
+                print_done()
+
+            def printer(number: str) -> None:
+                pending_numbers.append(number)
+                if len(pending_numbers) >= self.batch_size:
+                    submit_pending()
+
+            yield printer
+
+            if pending_numbers:
+                submit_pending()
+            print_done(wait=True)
+
+        out.write(self._footer())
+
+
+def summary_numbers(low: int, high: int, width: Optional[int] = None) -> Iterator[str]:
+    """Yield the numbers from low up to (excluding) high, zero padded to width digits.
+
+    Without a width the single digit numbers come first, followed by all the numbers
+    padded to two digits, e.g. 0-9 and then 00-99.
+    """
+    if width is None:
+        for n in range(max(low, 0), min(high, 10)):
+            yield str(n)
+        width = 2
+    for n in range(low, high):
+        yield f"{n:0{width}}"
+
+
+def _summary_words(
+    major: PhonemesMajorSystem, numbers: List[str], pos_mask: int, limit: Optional[int]
+) -> Dict[str, List[str]]:
+    if not pos_mask:
+        return major.number_to_words_many(numbers, limit)
 
-        def printer(number: str) -> None:
-            words = self._major.number_to_words(number)
-            if self._all_nouns:
-                words = list(filter(lambda word: word in self._all_nouns, words))
-            print(f"{number}: {', '.join(words)}\n")
+    found = major.number_to_words_many(numbers)
+    for number, words in found.items():
+        found[number] = major.filter_pos(words, pos_mask, limit)
+    return found
 
-        yield printer
 
-        print(self._footer())
+# Engine of a Summary worker process, see Summary._lookups()
+_worker_major: Optional[PhonemesMajorSystem] = None
+
+
+def _init_summary_worker(
+    index_file: Optional[str],
+    db_file: Optional[str],
+    mapping: Dict[int, List[str]],
+) -> None:
+    global _worker_major
+    _worker_major = PhonemesMajorSystem(
+        index_file=index_file, compact=True, db_file=db_file, mapping=mapping
+    )
+    _worker_major.index
+
+
+def _summary_worker_words(
+    numbers: List[str], pos_mask: int, limit: Optional[int]
+) -> Dict[str, List[str]]:
+    assert _worker_major is not None
+    return _summary_words(_worker_major, numbers, pos_mask, limit)
 
 
 class OrgSummary(Summary):
@@ -271,59 +818,272 @@ class OrgSummary(Summary):
 
         {explanation}
             """
-        ).format(explanation=explain())
+        ).format(explanation=explain() + "\n")
 
-    @contextmanager
-    def printer_object(self):
-        print(self._header())
-
-        grouping_size = 10
-        pending_numbers = []
-
-        def org_print_queue():
-            N = len(pending_numbers)
-
-            # Heading first
-            if N > 1:
-                print(f"* {pending_numbers[0]}-{pending_numbers[-1]}\n")
-            elif N:
-                print(f"* {pending_numbers[0]}\n")
-
-            # then the content
-            while pending_numbers:
-                number = pending_numbers.pop(0)
-                words = self._major.number_to_words(number)
-                if self._all_nouns:
-                    words = list(filter(lambda word: word in self._all_nouns, words))
-                print(f"{number}: {', '.join(words)}\n")
+    # Every heading groups this many numbers
+    batch_size = 10
+
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        # Heading first
+        if len(numbers) > 1:
+            heading = f"* {numbers[0]}-{numbers[-1]}\n\n"
+        else:
+            heading = f"* {numbers[0]}\n\n"
+
+        # then the content
+        return heading + super()._render_batch(numbers, found)
+
+
+class MarkdownSummary(Summary):
+    """Provide a summary as a Markdown table."""
+
+    def _header(self) -> str:
+        return (
+            "# Number Peg Examples\n\n"
+            f"```\n{explain()}```\n\n"
+            "| Number | Words |\n"
+            "| ------ | ----- |\n"
+        )
+
+    def _footer(self) -> str:
+        return ""
+
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        return "".join(
+            f"| {number} | {', '.join(found[number]).replace('|', '&#124;')} |\n"
+            for number in numbers
+        )
+
+
+class HtmlSummary(Summary):
+    """Provide a summary as a standalone HTML page."""
+
+    def _header(self) -> str:
+        return (
+            "<!DOCTYPE html>\n"
+            '<html>\n<head>\n<meta charset="utf-8">\n'
+            "<title>Number Peg Examples</title>\n</head>\n<body>\n"
+            "<h1>Number Peg Examples</h1>\n"
+            f"<pre>{html.escape(explain())}</pre>\n"
+            "<table>\n<tr><th>Number</th><th>Words</th></tr>\n"
+        )
+
+    def _footer(self) -> str:
+        return "</table>\n</body>\n</html>\n"
 
-        def printer(number: str) -> None:
-            pending_numbers.append(number)
-            if len(pending_numbers) >= grouping_size:
-                org_print_queue()
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        return "".join(
+            f"<tr><td>{number}</td><td>{html.escape(', '.join(found[number]))}</td></tr>\n"
+            for number in numbers
+        )
+
+
+class CsvSummary(Summary):
+    """Provide a summary as CSV, a number and its comma separated words per row."""
+
+    def _header(self) -> str:
+        return "number,words\n"
 
-        yield printer
+    def _footer(self) -> str:
+        return ""
 
-        # Print remainder
-        org_print_queue()
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        rows = io.StringIO()
+        writer = csv.writer(rows, lineterminator="\n")
+        writer.writerows((number, ", ".join(found[number])) for number in numbers)
+        return rows.getvalue()
 
-        print(self._footer())
 
+class JsonSummary(Summary):
+    """Provide a summary as a JSON list of {"number", "words"} objects."""
 
-def print_number_words(numbers: Tuple[str], nouns_only: bool = False) -> None:
-    """Print out a series of possible words that can match the given numbers."""
-    major = PhonemesMajorSystem()
+    def _header(self) -> str:
+        return "["
 
-    if nouns_only:
-        nouns = {x.name().split(".", 1)[0] for x in wn.all_synsets("n")}
+    def _footer(self) -> str:
+        return "\n]\n" if self._rendered else "]\n"
 
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        items = [
+            json.dumps({"number": number, "words": found[number]}) for number in numbers
+        ]
+        return ("," if self._rendered else "") + "\n" + ",\n".join(items)
+
+
+class AnkiSummary(Summary):
+    """Provide a summary Anki can import as notes, number on the front, words on the back.
+
+    It is tab separated text with the file headers of Anki 2.1.55 and later.
+    """
+
+    def _header(self) -> str:
+        return "#separator:tab\n#html:false\n#columns:Number\tWords\n"
+
+    def _footer(self) -> str:
+        return ""
+
+    def _render_batch(self, numbers: List[str], found: Dict[str, List[str]]) -> str:
+        return "".join(f"{number}\t{', '.join(found[number])}\n" for number in numbers)
+
+
+# Summary class of every --format of words-summary
+SUMMARY_FORMATS = {
+    "text": Summary,
+    "org": OrgSummary,
+    "markdown": MarkdownSummary,
+    "html": HtmlSummary,
+    "csv": CsvSummary,
+    "json": JsonSummary,
+    "anki": AnkiSummary,
+}
+
+
+def segment(
+    number: str, major_system: Optional[PhonemesMajorSystem] = None
+) -> List[Tuple[str, str]]:
+    """Split a long number into a sequence of (digits, word) pairs."""
+    return (major_system or PhonemesMajorSystem()).segment(number)
+
+
+def print_number_segments(
+    numbers: Tuple[str], major_system: Optional[PhonemesMajorSystem] = None
+) -> None:
+    """Print out a sequence of words encoding each of the (long) numbers."""
+    major = major_system or PhonemesMajorSystem()
+
+    for number in numbers:
+        try:
+            with profile.phase("query"):
+                words = [word for _, word in major.segment(number)]
+        except ValueError as exc:
+            print(f"{number}: {exc}\n")
+        else:
+            with profile.phase("render"):
+                print(f"{number}: {' '.join(words)}\n")
+
+
+def print_words_major(
+    words: Iterable[str], major_system: Optional[MajorSystem] = None
+) -> None:
+    """Print the major-system value of every word, one per line."""
+    major = major_system or PhonemesMajorSystem()
+
+    # Tee the stream so words are converted in bulk while still being consumed lazily
+    words, to_convert = itertools.tee(words)
+    # Words are converted while they are printed, so this is query time as well
+    with profile.phase("render"):
+        for word, value in zip(words, major.words_to_major(to_convert)):
+            print(f"{word}: {value}")
+
+
+def print_pattern_words(
+    pattern: str,
+    major: PhonemesMajorSystem,
+    pos_mask: int = 0,
+    limit: Optional[int] = None,
+) -> None:
+    """Print the words of every value matching the pattern as they are found."""
+    for digits, words in major.pattern_words(pattern, None if pos_mask else limit):
+        if pos_mask:
+            words = major.filter_pos(words, pos_mask, limit)
+        if words:
+            with profile.phase("render"):
+                print(f"{digits}: {', '.join(words)}\n")
+
+
+def print_number_words(
+    numbers: Tuple[str],
+    nouns_only: bool = False,
+    major_system: Optional[PhonemesMajorSystem] = None,
+    pos_mask: int = 0,
+    limit: Optional[int] = None,
+) -> None:
+    """Print out a series of possible words that can match the given numbers.
+
+    With a limit only the best few words (see index.word_rank()) of every number are
+    printed.
+    """
+    major = major_system or PhonemesMajorSystem()
+    pos_mask |= pos.NOUN if nouns_only else 0
+
+    # Filtering may drop any of the words, so only cut them down afterwards
+    found = major.number_to_words_many(
+        (n for n in numbers if n.isdigit()), None if pos_mask else limit
+    )
     for number in numbers:
-        if number.isdigit():
-            words = major.number_to_words(number)
-            if nouns_only:
-                words = list(filter(lambda word: word in nouns, words))
-            print(f"{number}: {', '.join(words)}\n")
+        if is_pattern(number):
+            print_pattern_words(number, major, pos_mask, limit)
+        elif number.isdigit():
+            words = found[number]
+            if pos_mask:
+                words = major.filter_pos(words, pos_mask, limit)
+            with profile.phase("render"):
+                print(f"{number}: {', '.join(words)}\n")
         else:
             # looking to translate the word
             word = number
-            print(f"{word}: {major.word_to_major(word)}\n")
+            with profile.phase("query"):
+                major_value = major.word_to_major(word)
+            with profile.phase("render"):
+                print(f"{word}: {major_value}\n")
+
+
+def batched(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split a stream into lists of at most size items, reading it lazily."""
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def number_word_records(
+    inputs: Iterable[str],
+    major_system: Optional[PhonemesMajorSystem] = None,
+    pos_mask: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Iterator[Dict[str, Any]]:
+    """Yield a record for every number, pattern or word of a (long) stream.
+
+    Inputs are looked up batch_size at a time, so memory stays the same however long
+    the stream is. Records are one of:
+
+        {"number": "42", "words": [...]}
+        {"pattern": "9?3", "matches": {"903": [...], ...}}
+        {"word": "office", "major": "80"}
+    """
+    major = major_system or PhonemesMajorSystem()
+
+    def words_of(words: List[str]) -> List[str]:
+        return major.filter_pos(words, pos_mask, limit) if pos_mask else words
+
+    for batch in batched(inputs, batch_size):
+        numbers = [i for i in batch if i.isdigit()]
+        words = [i for i in batch if not i.isdigit() and not is_pattern(i)]
+        found = major.number_to_words_many(numbers, None if pos_mask else limit)
+        values = dict(zip(words, major.words_to_major(words)))
+
+        for item in batch:
+            if item.isdigit():
+                yield {"number": item, "words": words_of(found[item])}
+            elif is_pattern(item):
+                matches = major.pattern_words(item, None if pos_mask else limit)
+                filtered = ((digits, words_of(ws)) for digits, ws in matches)
+                # Like print_pattern_words(), values left without words are dropped
+                yield {"pattern": item, "matches": {d: ws for d, ws in filtered if ws}}
+            else:
+                yield {"word": item, "major": values[item]}
+
+
+def print_number_word_records(
+    inputs: Iterable[str],
+    major_system: Optional[PhonemesMajorSystem] = None,
+    pos_mask: int = 0,
+    limit: Optional[int] = None,
+) -> None:
+    """Print the record (see number_word_records()) of every input as a JSON line."""
+    for record in number_word_records(inputs, major_system, pos_mask, limit):
+        with profile.phase("render"):
+            print(json.dumps(record))
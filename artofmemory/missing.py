@@ -5,6 +5,7 @@ import random
 import textwrap
 from typing import List
 
+from . import profile
 from .terminal import LineRepeater
 from .data import bible
 
@@ -44,14 +45,16 @@ def quiz_missing(items: List[str], talk=False):
         total = len(shuffled)
         last_item = shuffled.pop()
         term = LineRepeater()
-        for n, item in enumerate(shuffled):
-            if talk:
-                say(item)
-            term.write(f"{n:2}/{total}: {item}")
+        # Every item waits for a key press, so this is mostly time spent by the player
+        with profile.phase("quiz"):
+            for n, item in enumerate(shuffled):
+                if talk:
+                    say(item)
+                term.write(f"{n:2}/{total}: {item}")
 
-        if talk:
-            say("Okay, what is missing?")
-        ans = input("What is missing? ")
+            if talk:
+                say("Okay, what is missing?")
+            ans = input("What is missing? ")
         if ans.lower() == last_item.lower():
             print("Well done!")
         else:
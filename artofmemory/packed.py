@@ -0,0 +1,350 @@
+"""Binary, memory-mapped form of the major-system index.
+
+The file is laid out so that it can be queried in place: every table is a flat array
+of native uint32 values followed by the packed UTF-8 text they point into. Opening it
+only maps the file, hence any number of processes share a single page-cached copy.
+
+    header
+    key_offsets[n_keys + 1]                 start of each digit string in the key blob
+    entry_offsets[n_keys + 1]               start of each key's words in the entries table
+    entries[n_entries]                      word ids, best first per key (see word_rank)
+    word_offsets[n_words + 1]               start of each word in the word blob
+    word_keys[n_words]                      key id of each word's primary pronunciation
+    variant_words[n_variant_words]          sorted ids of words with other digits
+    variant_offsets[n_variant_words + 1]    start of each such word's variant keys
+    variant_keys[n_variants]                key ids of the other pronunciations
+    key blob                                sorted digit strings
+    word blob                               sorted words
+    word_pos[n_words]                       optional uint8 part of speech flags of each word
+"""
+
+import bisect
+import io
+import mmap
+import struct
+from array import array
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from . import profile
+from .index import (
+    BaseIndex,
+    MajorIndex,
+    atomic_write,
+    cache_key,
+    cache_path,
+    load_index,
+)
+
+MAGIC = b"AOMPACK\x00"
+FORMAT_VERSION = 3
+
+# Written in native order, a mismatch tells us the file came from another platform
+BYTE_ORDER_MARK = 0x01020304
+
+# magic, version, byte order mark, cache key, the seven table sizes, has word_pos
+HEADER = struct.Struct("=8sII40sIIIIIIII")
+
+assert array("I").itemsize == 4, "uint32 tables need a 4 byte array typecode"
+
+
+class _PackedStrings(Sequence):
+    """Read-only sequence of byte strings stored as an offset table and a blob.
+
+    Only the requested item is ever copied out of the underlying buffer, which is
+    enough for bisect to binary search the strings in place.
+    """
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0 or i >= len(self):
+            raise IndexError(i)
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes()
+
+
+class PackedIndex(BaseIndex):
+    """Query a packed index through memoryviews without deserializing it."""
+
+    def __init__(self, buffer: Union[bytes, bytearray, mmap.mmap]):
+        self._buffer = buffer
+        view = memoryview(buffer)
+
+        if len(view) < HEADER.size or view[: len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError("Not a packed major-system index")
+        (
+            _,
+            fmt,
+            bom,
+            key,
+            n_keys,
+            n_entries,
+            n_words,
+            n_variant_words,
+            n_variants,
+            key_blob,
+            word_blob,
+            has_pos,
+        ) = HEADER.unpack_from(view)
+        if fmt != FORMAT_VERSION:
+            raise ValueError(f"Unsupported packed index version {fmt}")
+        if bom != BYTE_ORDER_MARK:
+            raise ValueError("Packed index was written with a different byte order")
+        self.key = key.decode("ascii")
+        self._max_digits: Optional[int] = None
+
+        uint32_count = 2 * (n_keys + 1) + n_entries + (n_words + 1) + n_words
+        uint32_count += 2 * n_variant_words + 1 + n_variants
+        pos_size = n_words if has_pos else 0
+        if len(view) < HEADER.size + 4 * uint32_count + key_blob + word_blob + pos_size:
+            raise ValueError("Truncated packed index")
+
+        pos = HEADER.size
+
+        def take(size: int) -> memoryview:
+            nonlocal pos
+            start, pos = pos, pos + size
+            return view[start:pos]
+
+        def take_uint32(count: int) -> memoryview:
+            return take(count * 4).cast("I")
+
+        key_offsets = take_uint32(n_keys + 1)
+        self._entry_offsets = take_uint32(n_keys + 1)
+        self._entries = take_uint32(n_entries)
+        word_offsets = take_uint32(n_words + 1)
+        self._word_keys = take_uint32(n_words)
+        self._variant_words = take_uint32(n_variant_words)
+        self._variant_offsets = take_uint32(n_variant_words + 1)
+        self._variant_keys = take_uint32(n_variants)
+        self._key_offsets = key_offsets
+        self._keys = _PackedStrings(key_offsets, take(key_blob))
+        self._words = _PackedStrings(word_offsets, take(word_blob))
+        self._word_pos = take(n_words) if has_pos else None
+
+    @classmethod
+    def open(cls, path: str, key: Optional[str] = None) -> "PackedIndex":
+        """Memory map the packed index at path.
+
+        When key is given, the index must have been written for that cache_key(),
+        otherwise it is out of date and a ValueError is raised.
+        """
+        with profile.phase("index load"):
+            with open(path, "rb") as fh:
+                buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            packed = cls(buffer)
+        if key is not None and packed.key != key:
+            raise ValueError(f"Packed index {path} is stale, please rebuild it")
+        return packed
+
+    @classmethod
+    def from_index(cls, index: MajorIndex, key: str) -> "PackedIndex":
+        """Pack a MajorIndex in memory, a fraction of the size of its dictionaries."""
+        buffer = io.BytesIO()
+        cls._pack(index, key, buffer)
+        return cls(buffer.getvalue())
+
+    @classmethod
+    def write(cls, index: MajorIndex, path: str, key: str) -> None:
+        """Pack a MajorIndex into the binary format at path."""
+        with atomic_write(path) as fh:
+            cls._pack(index, key, fh)
+
+    @staticmethod
+    def _pack(index: MajorIndex, key: str, fh: BinaryIO) -> None:
+        keys = sorted(index.digit_words, key=lambda k: k.encode("utf-8"))
+        words = sorted(index.word_digits, key=lambda w: w.encode("utf-8"))
+        key_ids = {k: i for i, k in enumerate(keys)}
+        word_ids = {w: i for i, w in enumerate(words)}
+
+        entry_offsets = array("I", [0])
+        entries = array("I")
+        for k in keys:
+            entries.extend(word_ids[w] for w in index.digit_words[k])
+            entry_offsets.append(len(entries))
+
+        word_keys = array("I", [key_ids[index.word_digits[w]] for w in words])
+
+        variant_words = array("I")
+        variant_offsets = array("I", [0])
+        variant_keys = array("I")
+        for i, w in enumerate(words):
+            if w in index.word_variants:
+                variant_words.append(i)
+                variant_keys.extend(key_ids[k] for k in index.word_variants[w])
+                variant_offsets.append(len(variant_keys))
+        key_offsets, key_blob = _pack_strings(keys)
+        word_offsets, word_blob = _pack_strings(words)
+        word_pos = None
+        if index.word_pos is not None:
+            word_pos = bytes(index.word_pos.get(w, 0) for w in words)
+
+        header = HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            BYTE_ORDER_MARK,
+            key.encode("ascii"),
+            len(keys),
+            len(entries),
+            len(words),
+            len(variant_words),
+            len(variant_keys),
+            len(key_blob),
+            len(word_blob),
+            word_pos is not None,
+        )
+        fh.write(header)
+        for table in (
+            key_offsets,
+            entry_offsets,
+            entries,
+            word_offsets,
+            word_keys,
+            variant_words,
+            variant_offsets,
+            variant_keys,
+        ):
+            table.tofile(fh)
+        fh.write(key_blob)
+        fh.write(word_blob)
+        if word_pos is not None:
+            fh.write(word_pos)
+
+    def close(self) -> None:
+        """Release the mapping, the index must not be used afterwards."""
+        self._key_offsets = self._keys = self._words = None  # type: ignore
+        self._entry_offsets = self._entries = self._word_keys = None  # type: ignore
+        self._variant_words = self._variant_offsets = None  # type: ignore
+        self._variant_keys = None  # type: ignore
+        self._word_pos = None
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def memory_usage(self) -> int:
+        return len(self._buffer)
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def _find(self, strings: _PackedStrings, value: str, lo: int = 0) -> Optional[int]:
+        encoded = value.encode("utf-8")
+        i = bisect.bisect_left(strings, encoded, lo)
+        if i < len(strings) and strings[i] == encoded:
+            return i
+        return None
+
+    def _words_of(self, key_id: int, limit: Optional[int] = None) -> List[str]:
+        start, end = self._entry_offsets[key_id], self._entry_offsets[key_id + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self._words[w].decode("utf-8") for w in self._entries[start:end]]
+
+    def lookup(self, digits: str, limit: Optional[int] = None) -> List[str]:
+        i = self._find(self._keys, digits)
+        return [] if i is None else self._words_of(i, limit)
+
+    def lookup_many(
+        self, keys: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        # Sorted queries let every binary search start where the previous one ended
+        found: Dict[str, List[str]] = {}
+        lo = 0
+        for key in sorted(set(keys)):
+            i = self._find(self._keys, key, lo)
+            if i is None:
+                found[key] = []
+            else:
+                found[key] = self._words_of(i, limit)
+                lo = i
+        return found
+
+    def digits_for(self, word: str) -> Optional[str]:
+        i = self._find(self._words, word.lower())
+        if i is None:
+            return None
+        return self._keys[self._word_keys[i]].decode("ascii")
+
+    def digits_all(self, word: str) -> List[str]:
+        i = self._find(self._words, word.lower())
+        if i is None:
+            return []
+        key_ids = [self._word_keys[i]]
+        j = bisect.bisect_left(self._variant_words, i)
+        if j < len(self._variant_words) and self._variant_words[j] == i:
+            start, end = self._variant_offsets[j], self._variant_offsets[j + 1]
+            key_ids.extend(self._variant_keys[start:end])
+        return [self._keys[k].decode("ascii") for k in key_ids]
+
+    @property
+    def has_pos_flags(self) -> bool:
+        return self._word_pos is not None
+
+    def pos_flags(self, word: str) -> int:
+        if self._word_pos is None:
+            return super().pos_flags(word)
+        i = self._find(self._words, word)
+        return 0 if i is None else self._word_pos[i]
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        keys = self._keys
+        encoded = prefix.encode("ascii")
+        for i in range(bisect.bisect_left(keys, encoded), len(keys)):
+            key = keys[i]
+            if not key.startswith(encoded):
+                break
+            yield key.decode("ascii")
+
+    @property
+    def max_digits(self) -> int:
+        if self._max_digits is None:
+            offsets = self._key_offsets
+            self._max_digits = max(
+                (offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)),
+                default=0,
+            )
+        return self._max_digits
+
+
+def load_compact(phonemes2num: Dict[str, int]) -> PackedIndex:
+    """Return the index for the phoneme mapping in its packed form.
+
+    The packed copy is cached next to the regular index and memory mapped, so it is
+    quicker to open and a fraction of the size of the regular index's dictionaries.
+    """
+    key = cache_key(phonemes2num)
+    path = cache_path(phonemes2num, "idx")
+    try:
+        return PackedIndex.open(path, key=key)
+    except (OSError, ValueError):
+        pass
+
+    index = load_index(phonemes2num, keep=False)
+    try:
+        PackedIndex.write(index, path, key)
+    except OSError:
+        return PackedIndex.from_index(index, key)
+    return PackedIndex.open(path, key=key)
+
+
+def _pack_strings(strings: List[str]) -> Tuple[array, bytes]:
+    offsets = array("I", [0])
+    blob = bytearray()
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
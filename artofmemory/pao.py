@@ -2,6 +2,8 @@ import random
 import textwrap
 from configparser import ConfigParser
 
+from . import profile
+
 
 def explain() -> str:
     """Explain Person Action Object"""
@@ -55,8 +57,9 @@ def basic_quiz(config_file: str):
 
     It supports just testing your PAO + shuffling them up to test combos
     """
-    config = ConfigParser()
-    config.read(config_file)
+    with profile.phase("config read"):
+        config = ConfigParser()
+        config.read(config_file)
 
     # TODO -- add an option to limit the values to test
     # e.g. if I only want to test PAO for 1 through 4
@@ -67,14 +70,16 @@ def basic_quiz(config_file: str):
         return
 
     # Randomize the PAO items
-    pao_pairs = list(flatten_pao(config["pao"]))
-    random.shuffle(pao_pairs)
+    with profile.phase("flatten"):
+        pao_pairs = list(flatten_pao(config["pao"]))
+        random.shuffle(pao_pairs)
 
     correct = 0
     total = 0
     for number, item in pao_pairs:
         try:
-            guess = input("{}\n=> ".format(item))
+            with profile.phase("quiz"):
+                guess = input("{}\n=> ".format(item))
         except (EOFError, KeyboardInterrupt):
             break
         if not guess:
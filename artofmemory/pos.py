@@ -0,0 +1,47 @@
+"""Part of speech flags for words, derived from WordNet.
+
+WordNet is only imported by the functions computing flags, so anything answering
+from a precomputed table never has to load nltk.
+"""
+
+import functools
+from typing import Container, Dict
+
+NOUN = 1
+VERB = 2
+ADJECTIVE = 4
+ADVERB = 8
+
+# WordNet part of speech tags, adjective satellites count as adjectives
+WORDNET_FLAGS = {"n": NOUN, "v": VERB, "a": ADJECTIVE, "s": ADJECTIVE, "r": ADVERB}
+
+
+def wordnet_flags(words: Container[str]) -> Dict[str, int]:
+    """Flag every word with the parts of speech of the WordNet synsets named after it.
+
+    A single pass over all synsets, only words with at least one flag are returned.
+    """
+    from nltk.corpus import wordnet as wn
+
+    flags: Dict[str, int] = {}
+    for synset in wn.all_synsets():
+        name = synset.name().split(".", 1)[0]
+        if name in words:
+            flags[name] = flags.get(name, 0) | WORDNET_FLAGS[synset.pos()]
+    return flags
+
+
+@functools.lru_cache(maxsize=8192)
+def lookup_flags(word: str) -> int:
+    """Flags of a single word, for indexes without a precomputed table.
+
+    Only the synsets of the word itself are consulted and the most recent answers are
+    remembered, instead of enumerating every synset up front.
+    """
+    from nltk.corpus import wordnet as wn
+
+    flags = 0
+    for synset in wn.synsets(word):
+        if synset.name().split(".", 1)[0] == word:
+            flags |= WORDNET_FLAGS[synset.pos()]
+    return flags
@@ -0,0 +1,191 @@
+"""Wall and CPU time spent in the phases of a command, see aom.py --profile.
+
+The modules mark their phases with::
+
+    with profile.phase("query"):
+        ...
+
+Until enable() is called phase() hands out one shared no-op context manager, so the
+hooks cost next to nothing. Phases may nest, each one is only charged the time not
+spent in the phases nested inside it, hence the phase times add up to the total.
+
+Every thread keeps its own stack of running phases, so the threads of the server are
+timed apart; their phase times then add up to more than the total.
+
+Caches created while profiling hand their counters to track(), to be reported too.
+"""
+
+import contextlib
+import json
+import threading
+import time
+from typing import Callable, ContextManager, Dict, List, NamedTuple, Optional, Tuple
+
+# Phase name -> [calls, wall seconds, cpu seconds], None while profiling is disabled
+_phases: Optional[Dict[str, List[float]]] = None
+
+
+class _Stack(threading.local):
+    def __init__(self):
+        # Every running phase: [wall start, cpu start, wall in nested, cpu in nested]
+        self.phases: List[List[float]] = []
+
+
+# Running phases of the current thread
+_running = _Stack()
+
+# Threads add up their phase times in _phases
+_lock = threading.Lock()
+
+# Start of the profile: [wall, cpu]
+_started: List[float] = []
+
+# Name and counters of every cache created while profiling
+_tracked: List[Tuple[str, Callable[[], NamedTuple]]] = []
+
+_DISABLED = contextlib.nullcontext()
+
+
+def enable() -> None:
+    """Start recording phases, forgetting any earlier ones."""
+    global _phases
+    _phases = {}
+    _running.phases.clear()
+    _tracked.clear()
+    _started[:] = [time.perf_counter(), time.process_time()]
+
+
+def disable() -> None:
+    """Stop recording phases."""
+    global _phases
+    _phases = None
+    _running.phases.clear()
+    _tracked.clear()
+
+
+def is_enabled() -> bool:
+    return _phases is not None
+
+
+class _Phase(object):
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        _running.phases.append([time.perf_counter(), time.process_time(), 0.0, 0.0])
+
+    def __exit__(self, *exc_info) -> None:
+        stack = _running.phases
+        wall_start, cpu_start, nested_wall, nested_cpu = stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        if stack:
+            stack[-1][2] += wall
+            stack[-1][3] += cpu
+        phases = _phases
+        if phases is not None:
+            with _lock:
+                totals = phases.setdefault(self.name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += wall - nested_wall
+                totals[2] += cpu - nested_cpu
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Charge the time spent in the with block to the named phase."""
+    if _phases is None:
+        return _DISABLED
+    return _Phase(name)
+
+
+def track(name: str, counters: Callable[[], NamedTuple]) -> None:
+    """Report the counters of a cache, those of caches sharing a name are added up."""
+    if _phases is not None:
+        _tracked.append((name, counters))
+
+
+def report() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Return the recorded phases and caches, and the total since enable().
+
+    Times are in seconds.
+    """
+    caches: Dict[str, Dict[str, float]] = {}
+    for name, counters in _tracked:
+        totals = caches.setdefault(name, {})
+        for field, value in counters()._asdict().items():
+            totals[field] = totals.get(field, 0) + value
+    phases = _phases or {}
+    total: Dict[str, float] = {}
+    if _started:
+        total = {
+            "wall": time.perf_counter() - _started[0],
+            "cpu": time.process_time() - _started[1],
+        }
+    return {
+        "phases": {
+            name: {"calls": calls, "wall": wall, "cpu": cpu}
+            for name, (calls, wall, cpu) in phases.items()
+        },
+        "caches": caches,
+        "total": total,
+    }
+
+
+def format_json(profile: Dict[str, Dict[str, Dict[str, float]]]) -> str:
+    return json.dumps(profile, indent=2)
+
+
+def format_table(profile: Dict[str, Dict[str, Dict[str, float]]]) -> str:
+    """Render a report() as a table, slowest phase first.
+
+    Time outside any phase (argument parsing, imports...) is listed as "other".
+    """
+    phases = sorted(
+        profile["phases"].items(), key=lambda item: item[1]["wall"], reverse=True
+    )
+    total = profile["total"]
+    rows = [("phase", "calls", "wall ms", "cpu ms")]
+    for name, times in phases:
+        rows.append(
+            (
+                name,
+                str(times["calls"]),
+                f"{times['wall'] * 1000:.1f}",
+                f"{times['cpu'] * 1000:.1f}",
+            )
+        )
+    if total:
+        other_wall = total["wall"] - sum(t["wall"] for _, t in phases)
+        other_cpu = total["cpu"] - sum(t["cpu"] for _, t in phases)
+        rows.append(
+            ("other", "", f"{other_wall * 1000:.1f}", f"{other_cpu * 1000:.1f}")
+        )
+        rows.append(
+            ("total", "", f"{total['wall'] * 1000:.1f}", f"{total['cpu'] * 1000:.1f}")
+        )
+
+    width = max(len(row[0]) for row in rows)
+    table = "\n".join(
+        f"{name:<{width}}  {calls:>5}  {wall:>9}  {cpu:>9}"
+        for name, calls, wall, cpu in rows
+    )
+
+    caches = profile.get("caches")
+    if caches:
+        rows = [("cache", "hits", "misses", "evictions", "size")]
+        for name, counts in sorted(caches.items()):
+            rows.append(
+                (
+                    name,
+                    str(counts["hits"]),
+                    str(counts["misses"]),
+                    str(counts["evictions"]),
+                    f"{counts['currsize']}/{counts['maxsize']}",
+                )
+            )
+        width = max(len(row[0]) for row in rows)
+        table += "\n\n" + "\n".join(
+            f"{name:<{width}}  {hits:>7}  {misses:>7}  {evictions:>9}  {size:>11}"
+            for name, hits, misses, evictions, size in rows
+        )
+    return table
@@ -0,0 +1,214 @@
+"""Keep the major system resident and answer lookups over a local Unix socket.
+
+Every request is one line of JSON naming an engine method and its arguments, e.g.
+
+    {"method": "number_to_words_many", "args": [["42", "903"]]}
+
+and every reply is one line of JSON with either the "result" or an "error". The
+MajorSystemClient speaks this protocol while passing for a regular MajorSystem, so the
+printing functions of artofmemory.major work against a server unchanged.
+"""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import pos
+from .major import MajorSystem, PhonemesMajorSystem, batched
+
+# Engine methods a client may call
+METHODS = frozenset(
+    [
+        "word_to_major",
+        "word_to_major_all",
+        "words_to_major",
+        "number_to_words",
+        "number_to_words_many",
+        "filter_pos",
+        "segment",
+        "pattern_words",
+    ]
+)
+
+# Errors raised by an engine method that are passed on to the client to re-raise
+ERRORS = {"ValueError": ValueError, "LookupError": LookupError}
+
+# Words sent per request when converting a stream of words
+WORDS_BATCH_SIZE = 1000
+
+
+def default_socket_path() -> str:
+    """Per-user socket path, in $XDG_RUNTIME_DIR when there is one."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "artofmemory.sock")
+    return os.path.join(tempfile.gettempdir(), f"artofmemory-{os.getuid()}.sock")
+
+
+def _bad_request(reason: str) -> Dict[str, Any]:
+    return {"error": f"Bad request: {reason}", "type": "ValueError"}
+
+
+def call(major_system: PhonemesMajorSystem, request: Any) -> Dict[str, Any]:
+    """Answer a single decoded request with the engine.
+
+    Whatever goes wrong is answered with an error, so the client always gets a reply.
+    """
+    if not isinstance(request, dict):
+        return _bad_request("expected a JSON object")
+    method = request.get("method")
+    if method not in METHODS:
+        return {"error": f"Unknown method {method!r}", "type": "ValueError"}
+    args = request.get("args", [])
+    if not isinstance(args, list):
+        return _bad_request("args must be a list")
+    try:
+        result = getattr(major_system, method)(*args)
+        if isinstance(result, Iterator):
+            result = list(result)
+    except Exception as exc:
+        # Types not in ERRORS (e.g. arguments of the wrong type) are raised by the
+        # client as a RuntimeError
+        return {"error": str(exc), "type": type(exc).__name__}
+    return {"result": result}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                reply = _bad_request(str(exc))
+            else:
+                reply = call(self.server.major_system, request)
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class MajorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve one engine to any number of concurrent clients."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, major_system: PhonemesMajorSystem):
+        self.major_system = major_system
+        _remove_stale_socket(path)
+        super().__init__(path, _Handler)
+
+    def warm_up(self) -> None:
+        """Load everything a request could need before accepting any."""
+        self.major_system.index
+        try:
+            self.major_system.filter_pos([], pos.NOUN)
+        except LookupError:
+            # No WordNet data, part of speech filters fail per request instead
+            pass
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path: str) -> None:
+    """Remove a socket left behind by a server that is gone, refuse a live one."""
+    if not os.path.exists(path):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(f"A server is already listening on {path}")
+
+
+def serve(path: str, major_system: Optional[PhonemesMajorSystem] = None) -> None:
+    """Answer requests on the socket at path until interrupted."""
+    # Leave through the with block on a plain kill too, so the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with MajorServer(path, major_system or PhonemesMajorSystem()) as server:
+        server.warm_up()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+class MajorSystemClient(MajorSystem):
+    """A major system answering every call through a running server."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_socket_path()
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._socket.connect(self.path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile("rwb")
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "MajorSystemClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _call(self, method: str, *args) -> Any:
+        request = {"method": method, "args": args}
+        self._file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError(f"Server on {self.path} closed the connection")
+        reply = json.loads(line)
+        if "error" in reply:
+            error = ERRORS.get(reply.get("type"))
+            if error is None:
+                raise RuntimeError(f"{reply.get('type')}: {reply['error']}")
+            raise error(reply["error"])
+        return reply["result"]
+
+    def word_to_major(self, word: str) -> str:
+        return self._call("word_to_major", word)
+
+    def word_to_major_all(self, word: str) -> List[str]:
+        return self._call("word_to_major_all", word)
+
+    def words_to_major(self, words: Iterable[str]) -> Iterator[str]:
+        for batch in batched(words, WORDS_BATCH_SIZE):
+            yield from self._call("words_to_major", batch)
+
+    def number_to_words(self, number: str, limit: Optional[int] = None) -> List[str]:
+        return self._call("number_to_words", number, limit)
+
+    def number_to_words_many(
+        self, numbers: Iterable[str], limit: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        return self._call("number_to_words_many", list(numbers), limit)
+
+    def filter_pos(
+        self, words: Iterable[str], mask: int, limit: Optional[int] = None
+    ) -> List[str]:
+        return self._call("filter_pos", list(words), mask, limit)
+
+    def segment(self, number: str) -> List[Tuple[str, str]]:
+        return [tuple(pair) for pair in self._call("segment", number)]
+
+    def pattern_words(
+        self, pattern: str, limit: Optional[int] = None
+    ) -> Iterator[Tuple[str, List[str]]]:
+        for digits, words in self._call("pattern_words", pattern, limit):
+            yield digits, words
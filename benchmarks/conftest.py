@@ -0,0 +1,128 @@
+"""Timing fixtures for the benchmark suite.
+
+Every benchmark times its function a few times and keeps the fastest run, which is
+the least disturbed by whatever else the machine is doing. Results can be written to
+a JSON file with --bench-save and checked against an earlier file with
+--bench-compare, failing any benchmark slower than --bench-threshold allows.
+"""
+
+import gc
+import json
+import platform
+import time
+from typing import Callable, Dict, Optional
+
+import pytest
+
+# Collected over the whole session, written out by pytest_sessionfinish()
+_RESULTS: Dict[str, Dict[str, float]] = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--bench-save", metavar="FILE", help="Write the benchmark timings as JSON"
+    )
+    group.addoption(
+        "--bench-compare",
+        metavar="FILE",
+        help="Fail benchmarks slower than in this earlier --bench-save file",
+    )
+    group.addoption(
+        "--bench-threshold",
+        metavar="FRACTION",
+        type=float,
+        default=0.5,
+        help="Slowdown allowed by --bench-compare (default: 0.5 for 50%%)",
+    )
+    group.addoption(
+        "--bench-rounds",
+        metavar="INT",
+        type=int,
+        default=10,
+        help="Number of times every benchmark is run (default: 10)",
+    )
+
+
+class Bench(object):
+    """Time a callable, recording the result under the benchmark's name."""
+
+    def __init__(
+        self,
+        name: str,
+        rounds: int,
+        baseline: Optional[Dict[str, float]],
+        threshold: float,
+    ):
+        self.name = name
+        self.rounds = rounds
+        self.baseline = baseline
+        self.threshold = threshold
+
+    def __call__(self, func: Callable, *args, **kwargs):
+        """Run func(*args, **kwargs) rounds times and return its last result."""
+        timings = []
+        # Like timeit, keep garbage collection pauses out of the timings
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(self.rounds):
+                start = time.perf_counter()
+                result = func(*args, **kwargs)
+                timings.append(time.perf_counter() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        best = min(timings)
+        _RESULTS[self.name] = {
+            "min": best,
+            "mean": sum(timings) / len(timings),
+            "rounds": len(timings),
+        }
+
+        if self.baseline is not None:
+            allowed = self.baseline["min"] * (1 + self.threshold)
+            if best > allowed:
+                pytest.fail(
+                    f"{self.name} took {best:.6f}s, "
+                    f"more than {allowed:.6f}s allowed by the baseline"
+                )
+        return result
+
+
+@pytest.fixture(scope="session")
+def _bench_baseline(pytestconfig) -> Dict[str, Dict[str, float]]:
+    path = pytestconfig.getoption("bench_compare")
+    if not path:
+        return {}
+    with open(path) as fh:
+        return json.load(fh)["benchmarks"]
+
+
+@pytest.fixture
+def bench(request, pytestconfig, _bench_baseline) -> Bench:
+    name = request.node.name
+    return Bench(
+        name,
+        rounds=pytestconfig.getoption("bench_rounds"),
+        baseline=_bench_baseline.get(name),
+        threshold=pytestconfig.getoption("bench_threshold"),
+    )
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption("bench_save")
+    if not path or not _RESULTS:
+        return
+    with open(path, "w") as fh:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "benchmarks": _RESULTS,
+            },
+            fh,
+            indent=2,
+            sort_keys=True,
+        )
@@ -0,0 +1,37 @@
+"""Benchmarks of starting the command line tool"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from artofmemory.major import PhonemesMajorSystem
+
+AOM = os.path.join(os.path.dirname(os.path.dirname(__file__)), "aom.py")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def warm_index_cache():
+    # The subprocesses share the index cache through XDG_CACHE_HOME, so only the
+    # start up time of the command itself is measured
+    PhonemesMajorSystem().index
+
+
+def run_aom(*args):
+    return subprocess.run(
+        [sys.executable, AOM, *args],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+@pytest.mark.parametrize(
+    "args",
+    [("card",), ("missing", "a", "b"), ("words", "42")],
+    ids=["card", "missing", "words"],
+)
+def test_cli_start(bench, args):
+    assert bench(run_aom, *args)
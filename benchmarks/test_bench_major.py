@@ -0,0 +1,84 @@
+"""Benchmarks of the major-system engines and summaries"""
+
+import contextlib
+import io
+
+import pytest
+
+from artofmemory.major import (
+    NaiveMajorSystem,
+    OrgSummary,
+    PhonemesMajorSystem,
+    Summary,
+    summary_numbers,
+)
+
+
+@pytest.fixture(scope="module")
+def phonemes():
+    major = PhonemesMajorSystem()
+    # Build (or load) the index up front so it is not part of any timing
+    major.index
+    return major
+
+
+@pytest.fixture(scope="module")
+def words(phonemes):
+    found = phonemes.number_to_words_many(str(n) for n in range(1000))
+    return sorted({word for words in found.values() for word in words})[:2000]
+
+
+def print_summary(summary_class, major_system, numbers, jobs=1):
+    summary = summary_class(major_system=major_system, jobs=jobs)
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        with summary.printer_object() as printer:
+            for number in numbers:
+                printer(number)
+    return out.getvalue()
+
+
+def test_number_to_words(bench, phonemes):
+    def number_to_words():
+        return [phonemes.number_to_words(str(n)) for n in range(1000)]
+
+    assert bench(number_to_words)[42]
+
+
+def test_number_to_words_limit(bench, phonemes):
+    numbers = [str(n) for n in range(50)]
+    found = bench(phonemes.number_to_words_many, numbers, 5)
+    assert all(len(words) <= 5 for words in found.values())
+
+
+def test_word_to_major_phonemes(bench, phonemes, words):
+    def word_to_major():
+        return [phonemes.word_to_major(word) for word in words]
+
+    assert len(bench(word_to_major)) == len(words)
+
+
+def test_word_to_major_naive(bench, words):
+    naive = NaiveMajorSystem()
+
+    def word_to_major():
+        return [naive.word_to_major(word) for word in words]
+
+    assert len(bench(word_to_major)) == len(words)
+
+
+@pytest.mark.parametrize("max_", [100, 1000])
+@pytest.mark.parametrize("summary_class", [Summary, OrgSummary])
+def test_summary(bench, phonemes, summary_class, max_):
+    output = bench(
+        print_summary, summary_class, phonemes, list(summary_numbers(0, max_))
+    )
+    assert f"{max_ - 1:02}" in output
+
+
+@pytest.mark.parametrize("jobs", [1, 2, 4])
+def test_summary_jobs(bench, phonemes, jobs):
+    # Includes starting the worker processes, which only pays off on larger ranges
+    output = bench(
+        print_summary, Summary, phonemes, list(summary_numbers(0, 10000)), jobs
+    )
+    assert "9999: " in output
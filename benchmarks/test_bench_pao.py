@@ -0,0 +1,17 @@
+"""Benchmarks of the Person Action Object helpers"""
+
+from configparser import ConfigParser
+
+from artofmemory.pao import flatten_pao
+
+
+def test_flatten_pao(bench, tmp_path):
+    config_file = tmp_path / "artofmemory.conf"
+    lines = ["[pao]"]
+    lines += [f"{n:03} = person {n}, action {n}, object {n}" for n in range(1000)]
+    config_file.write_text("\n".join(lines) + "\n")
+
+    config = ConfigParser()
+    config.read(config_file)
+
+    assert len(bench(lambda: list(flatten_pao(config["pao"])))) == 3000
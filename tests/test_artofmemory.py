@@ -1,6 +1,6 @@
 import unittest
 
-from artofmemory.major import NaiveMajorSystem
+from artofmemory.major import NaiveMajorSystem, compile_letter_mapping
 
 
 class TestArtOfMemory(unittest.TestCase):
@@ -45,3 +45,15 @@ class TestArtOfMemory(unittest.TestCase):
     def test_regex_builder_full(self):
         ret = NaiveMajorSystem()._regex_from_letter_mapping()
         self.assertEqual(ret, "(s|z|t|d|n|m|r|l|j|g|c|k|q|v|f|p|b)")
+
+    def test_compiled_is_shared(self):
+        self.assertIs(NaiveMajorSystem().compiled, NaiveMajorSystem().compiled)
+
+    def test_compiled_letter_groups(self):
+        compiled = compile_letter_mapping({1: ["th", "t"], 2: ["n"]})
+        self.assertEqual(compiled.translate("thin"), "12")
+        self.assertEqual(compiled.translate("tent"), "121")
+
+    def test_compiled_drops_unmapped(self):
+        compiled = NaiveMajorSystem().compiled
+        self.assertEqual(compiled.translate("Hello, world!"), "55451")
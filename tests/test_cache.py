@@ -0,0 +1,48 @@
+from artofmemory import profile
+from artofmemory.cache import CacheInfo, LRUCache
+from artofmemory.major import NaiveMajorSystem, PhonemesMajorSystem
+
+
+def test_lru_eviction():
+    cache = LRUCache(2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    # "b" is now the least recently used
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    assert cache.info() == CacheInfo(
+        hits=2, misses=1, evictions=1, maxsize=2, currsize=2
+    )
+
+
+def test_disabled():
+    cache = LRUCache(0)
+    cache.put("a", "1")
+    assert cache.get("a") is None
+    assert cache.info() == CacheInfo(0, 1, 0, 0, 0)
+
+
+def test_engines_cache_words():
+    for major in (PhonemesMajorSystem(cache_size=1), NaiveMajorSystem(cache_size=1)):
+        values = [major.word_to_major(word) for word in ["office", "office", "dog"]]
+        assert values[0] == values[1] != values[2]
+        assert major.word_cache.info() == CacheInfo(1, 2, 1, 1, 1)
+
+
+def test_profile_reports_caches():
+    profile.enable()
+    try:
+        for _ in range(2):
+            cache = LRUCache(10, "words")
+            cache.put("a", "1")
+            cache.get("a")
+        report = profile.report()
+    finally:
+        profile.disable()
+
+    assert report["caches"] == {
+        "words": {"hits": 2, "misses": 0, "evictions": 0, "maxsize": 20, "currsize": 2}
+    }
+    assert "\nwords " in profile.format_table(report)
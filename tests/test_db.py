@@ -0,0 +1,124 @@
+"""Ensure the SQLite database answers exactly like the in-memory index"""
+
+import contextlib
+import sqlite3
+
+import pytest
+
+from artofmemory import pos
+from artofmemory.db import SqliteIndex
+from artofmemory.index import MajorIndex
+from artofmemory.major import PhonemesMajorSystem
+
+KEY = "0" * 40
+
+
+@pytest.fixture
+def small_index():
+    return MajorIndex(
+        {
+            "17": ["dog", "tack", "tick"],
+            "80": ["office"],
+            "82": ["often"],
+            "812": ["often"],
+            "": ["eye"],
+        },
+        {
+            "dog": "17",
+            "tack": "17",
+            "tick": "17",
+            "office": "80",
+            "often": "82",
+            "eye": "",
+        },
+        word_pos={"dog": pos.NOUN | pos.VERB, "office": pos.NOUN},
+        word_variants={"often": ["812"]},
+        phonemes2num=PhonemesMajorSystem().phonemes2num,
+    )
+
+
+@pytest.fixture
+def db_path(tmp_path, small_index):
+    path = str(tmp_path / "major.db")
+    naive = {"dog": "17", "tack": "177", "tick": "177", "office": "88", "eye": ""}
+    pronunciations = {
+        "dog": ["D AO1 G"],
+        "tack": ["T AE1 K"],
+        "tick": ["T IH1 K"],
+        "office": ["AO1 F AH0 S", "AO1 F IH0 S"],
+        "often": ["AO1 F AH0 N", "AO1 F T AH0 N", "AA1 F AH0 N"],
+        "eye": ["AY1"],
+    }
+    SqliteIndex.write(small_index, path, KEY, naive, pronunciations)
+    return path
+
+
+def test_round_trip(db_path):
+    db = SqliteIndex.open(db_path, key=KEY)
+    assert db.lookup("17") == ["dog", "tack", "tick"]
+    assert db.lookup("17", limit=2) == ["dog", "tack"]
+    assert db.lookup("") == ["eye"]
+    assert db.lookup("99") == []
+    assert db.lookup_many(["17", "99", "812"], limit=1) == {
+        "17": ["dog"],
+        "99": [],
+        "812": ["often"],
+    }
+    assert db.digits_for("Office") == "80"
+    assert db.digits_for("cat") is None
+    assert db.digits_all("often") == ["82", "812"]
+    assert db.pos_flags("dog") == pos.NOUN | pos.VERB
+    assert db.pos_flags("tack") == 0
+    assert list(db.keys_with_prefix("8")) == ["80", "812", "82"]
+    assert db.max_digits == 3
+    assert len(db) == 6
+    db.close()
+
+
+def test_ad_hoc_queries(db_path):
+    with contextlib.closing(sqlite3.connect(db_path)) as db:
+        rows = db.execute(
+            "SELECT word, naive, syllables FROM words WHERE digits = '17' AND pos & ?"
+            " ORDER BY rank",
+            (pos.NOUN,),
+        ).fetchall()
+    assert rows == [("dog", "17", 1)]
+
+    with contextlib.closing(sqlite3.connect(db_path)) as db:
+        rows = db.execute(
+            "SELECT variant, phonemes, pronunciations.digits FROM pronunciations"
+            " JOIN words ON words.id = word_id WHERE word = 'often' ORDER BY variant"
+        ).fetchall()
+    assert rows == [
+        (0, "AO1 F AH0 N", "82"),
+        (1, "AO1 F T AH0 N", "812"),
+        (2, "AA1 F AH0 N", "82"),
+    ]
+
+
+def test_stale_key(db_path):
+    with pytest.raises(ValueError, match="stale"):
+        SqliteIndex.open(db_path, key="1" * 40)
+
+
+def test_not_a_database(tmp_path):
+    path = tmp_path / "major.db"
+    path.write_bytes(b"certainly not a database")
+    with pytest.raises(ValueError, match="not a major-system database"):
+        SqliteIndex.open(str(path))
+
+
+def test_db_file(tmp_path):
+    path = str(tmp_path / "major.db")
+    PhonemesMajorSystem().write_db(path)
+
+    major = PhonemesMajorSystem(db_file=path)
+    assert isinstance(major.index, SqliteIndex)
+    numbers = ["42", "903", "9?3"]
+    expected = PhonemesMajorSystem().number_to_words_many(numbers[:2], limit=5)
+    assert major.number_to_words_many(numbers[:2], limit=5) == expected
+    assert dict(major.pattern_words("9?3", 2)) == dict(
+        PhonemesMajorSystem().pattern_words("9?3", 2)
+    )
+    assert major.word_to_major("office") == "80"
+    major.index.close()
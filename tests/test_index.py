@@ -0,0 +1,144 @@
+"""Ensure the Major system index is built, cached and invalidated properly"""
+
+import os
+
+from artofmemory import index
+from artofmemory.major import PhonemesMajorSystem
+
+
+def test_cache_key_tracks_mapping():
+    phonemes2num = PhonemesMajorSystem().phonemes2num
+    changed = dict(phonemes2num, NG=7)
+
+    assert index.cache_key(phonemes2num) == index.cache_key(dict(phonemes2num))
+    assert index.cache_key(phonemes2num) != index.cache_key(changed)
+
+
+def test_save_and_load(tmp_path):
+    original = index.MajorIndex(
+        {"17": ["dog", "tack"], "82": ["often"], "812": ["often"]},
+        {"dog": "17", "tack": "17", "often": "82"},
+        word_variants={"often": ["812"]},
+    )
+    path = str(tmp_path / "nested" / "index.pickle")
+    original.save(path)
+
+    loaded = index.MajorIndex.load(path)
+    assert loaded.lookup("17") == ["dog", "tack"]
+    assert loaded.digits_for("DOG") == "17"
+    assert loaded.digits_for("cat") is None
+    assert loaded.digits_all("Often") == ["82", "812"]
+    assert loaded.digits_all("dog") == ["17"]
+    assert loaded.digits_all("cat") == []
+
+
+def test_variants_agree_with_lookup():
+    major_index = index.load_index(PhonemesMajorSystem().phonemes2num)
+    assert major_index.word_variants
+    for digits, words in major_index.digit_words.items():
+        for word in words:
+            assert digits in major_index.digits_all(word)
+
+
+def test_load_index_is_cached(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(index, "_INDEXES", {})
+    phonemes2num = PhonemesMajorSystem().phonemes2num
+
+    built = index.load_index(phonemes2num)
+    cache_file = os.path.join(
+        index.cache_dir(), f"major-{index.cache_key(phonemes2num)}.pickle"
+    )
+    assert os.path.exists(cache_file)
+
+    # A fresh process reads the tables back instead of rebuilding them
+    monkeypatch.setattr(index, "_INDEXES", {})
+    monkeypatch.setattr(index.MajorIndex, "build", None)
+    loaded = index.load_index(phonemes2num)
+    assert loaded is not built
+    assert loaded.lookup("903") == built.lookup("903")
+    assert loaded.digits_for("office") == "80"
+
+
+def test_prefix_words():
+    idx = index.MajorIndex(
+        {"9": ["bee"], "94": ["bear", "pair"], "941": ["bird"], "95": ["bell"]},
+        {"bee": "9", "bear": "94", "pair": "94", "bird": "941", "bell": "95"},
+    )
+    assert idx.prefix_words("94") == ["bear", "pair", "bird"]
+    assert idx.prefix_words("9") == ["bee", "bear", "pair", "bell", "bird"]
+    assert idx.prefix_words("7") == []
+
+
+def test_prefix_words_shortest_first():
+    # "9400" sorts between "94" and "941" but has more digits than both
+    idx = index.MajorIndex(
+        {"94": ["bear"], "9400": ["brasses"], "941": ["bird"]},
+        {"bear": "94", "brasses": "9400", "bird": "941"},
+    )
+    assert idx.prefix_words("94") == ["bear", "bird", "brasses"]
+
+
+def test_longest_match():
+    major = PhonemesMajorSystem()
+    digits, words = major.longest_match("94120000")
+    assert "94120000".startswith(digits)
+    assert len(digits) > 1
+    assert words == major.number_to_words(digits)
+    assert major.longest_match("") == ("", [])
+
+
+def test_broken_cache_is_rebuilt(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(index, "_INDEXES", {})
+    phonemes2num = PhonemesMajorSystem().phonemes2num
+
+    os.makedirs(index.cache_dir())
+    cache_file = os.path.join(
+        index.cache_dir(), f"major-{index.cache_key(phonemes2num)}.pickle"
+    )
+    stale_file = os.path.join(index.cache_dir(), "major-stale.pickle")
+    with open(cache_file, "wb") as fh:
+        # Unpickling this refers to a module which does not exist
+        fh.write(b"cnosuchmodule\nthing\n.")
+    with open(stale_file, "wb") as fh:
+        fh.write(b"old")
+
+    assert index.load_index(phonemes2num).digits_for("office") == "80"
+    assert os.path.exists(cache_file)
+    assert not os.path.exists(stale_file)
+
+
+def test_remap_matches_build():
+    default = PhonemesMajorSystem().phonemes2num
+    base = index.MajorIndex.build(default)
+    # NG moves to 7 and the stressed ER vowels become silent
+    changed = {p: num for p, num in default.items() if p not in ("ER0", "ER1")}
+    changed["NG"] = 7
+
+    remapped = base.remap(changed, index.Lexicon.build())
+    built = index.MajorIndex.build(changed)
+    assert remapped.digit_words == built.digit_words
+    assert remapped.word_digits == built.word_digits
+    assert remapped.word_variants == built.word_variants
+    assert remapped.phonemes2num == changed
+    # The index remapped from is left as it was
+    assert base.digit_words == index.MajorIndex.build(default).digit_words
+
+
+def test_load_index_remaps_cached(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(index, "_INDEXES", {})
+    default = PhonemesMajorSystem().phonemes2num
+    index.load_index(default)
+
+    # Another mapping is derived from the cached index rather than built
+    monkeypatch.setattr(index, "_INDEXES", {})
+    monkeypatch.setattr(index.MajorIndex, "build", None)
+    remapped = index.load_index(dict(default, NG=7))
+    assert remapped.digits_for("finger") == "8774"
+    assert "finger" not in remapped.lookup("8274")
+
+    # Both mappings stay cached
+    for phonemes2num in (default, dict(default, NG=7)):
+        assert os.path.exists(index.cache_path(phonemes2num))
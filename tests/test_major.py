@@ -1,6 +1,30 @@
 """Ensure testing of the Major System does what we expect"""
 
-from artofmemory.major import NaiveMajorSystem, PhonemesMajorSystem
+import csv
+import fnmatch
+import io
+import json
+
+import pytest
+
+from artofmemory import pos
+from artofmemory.index import MajorIndex
+from artofmemory.major import (
+    LETTERS_SECTION,
+    PHONEMES_SECTION,
+    SUMMARY_FORMATS,
+    JsonSummary,
+    NaiveMajorSystem,
+    OrgSummary,
+    PhonemesMajorSystem,
+    Summary,
+    batched,
+    explain,
+    number_word_records,
+    print_pattern_words,
+    read_mapping,
+    summary_numbers,
+)
 
 
 def test_office():
@@ -15,3 +39,346 @@ def test_office():
     # passage, Alexander
 
     # burn => 942, Nope, it is 92
+
+
+def test_number_to_words():
+    words = PhonemesMajorSystem().number_to_words("903")
+    assert "possum" in words
+    assert "bosom" in words
+    # Words with several pronunciations are only listed once
+    assert len(words) == len(set(words))
+
+
+def test_number_to_words_ng():
+    # "NG" is a single phoneme for 2, not an "N" followed by a hard "G"
+    major = PhonemesMajorSystem()
+    assert "ring" in major.number_to_words("42")
+    assert "ring" not in major.number_to_words("427")
+    assert "nag" in major.number_to_words("27")
+    assert "nag" not in major.number_to_words("2")
+
+
+def test_segment():
+    number = "3141592653589793238462643383279502884197"
+    segments = PhonemesMajorSystem().segment(number)
+
+    assert "".join(digits for digits, _ in segments) == number
+    major = PhonemesMajorSystem()
+    for digits, word in segments:
+        assert word in major.number_to_words(digits)
+
+
+def test_segment_best_words():
+    major = PhonemesMajorSystem()
+    for digits, word in major.segment("94120"):
+        assert word == major.number_to_words(digits, limit=1)[0]
+
+
+def test_segment_prefers_fewer_words():
+    # "office" covers both digits, rather than "f" + "s" style pairs
+    assert len(PhonemesMajorSystem().segment("80")) == 1
+
+
+def test_segment_impossible():
+    major = PhonemesMajorSystem()
+    major._index = MajorIndex({"1": ["tea"]}, {"tea": "1"})
+    assert major.segment("111") == [("1", "tea")] * 3
+    with pytest.raises(ValueError):
+        major.segment("12")
+    with pytest.raises(ValueError):
+        major.segment("abc")
+
+
+def test_word_to_major_all():
+    major = PhonemesMajorSystem()
+    assert major.word_to_major_all("often") == ["82", "812"]
+    assert major.word_to_major_all("office") == ["80"]
+    assert major.word_to_major_all("qwxz") == []
+
+    assert "often" in major.number_to_words("82")
+    assert "often" in major.number_to_words("812")
+    assert major.word_to_major("often") == "82"
+
+
+def test_pattern_words():
+    major = PhonemesMajorSystem()
+
+    matches = major.pattern_words("9?3")
+    assert next(matches) == ("903", major.number_to_words("903"))
+    assert [digits for digits, _ in matches] == [
+        "913",
+        "923",
+        "943",
+        "953",
+        "963",
+        "973",
+        "983",
+        "993",
+    ]
+
+    prefixed = dict(major.pattern_words("42*"))
+    assert prefixed["42"] == major.number_to_words("42")
+    assert all(digits.startswith("42") for digits in prefixed)
+    assert set(prefixed) == set(major.index.keys_with_prefix("42"))
+
+    assert dict(major.pattern_words("555-1??")) == dict(major.pattern_words("5551??"))
+    keys = sorted(major.index.digit_words)
+    assert [digits for digits, _ in major.pattern_words("?*9?3*")] == (
+        fnmatch.filter(keys, "?*9?3*")
+    )
+
+
+def test_number_to_words_many():
+    major = PhonemesMajorSystem()
+    found = major.number_to_words_many(["42", "903", "42", "555-12"])
+
+    assert set(found) == {"42", "903", "555-12"}
+    assert found["903"] == major.number_to_words("903")
+    assert found["555-12"] == major.number_to_words("55512")
+
+
+def test_words_to_major():
+    words = ["office", "Letter", "circle", "basketball", "zzqx", ""]
+    for major in (NaiveMajorSystem(), PhonemesMajorSystem()):
+        expected = [major.word_to_major(word) for word in words]
+        assert list(major.words_to_major(iter(words))) == expected
+
+
+def test_ranked_words():
+    major = PhonemesMajorSystem()
+    words = major.number_to_words("42")
+
+    # Common words first, e.g. "run" before "hernia"
+    assert words.index("run") < words.index("hernia")
+    assert major.number_to_words("42", limit=3) == words[:3]
+    assert major.number_to_words_many(["42", "903"], limit=2) == {
+        "42": words[:2],
+        "903": major.number_to_words("903")[:2],
+    }
+
+
+def test_summary_limit(capsys):
+    major = PhonemesMajorSystem()
+    with Summary(major_system=major, limit=2).printer_object() as printer:
+        printer("42")
+
+    words = major.number_to_words("42")
+    assert f"\n42: {words[0]}, {words[1]}\n" in capsys.readouterr().out
+
+
+def test_number_word_records():
+    major = PhonemesMajorSystem()
+    consumed = []
+
+    def inputs():
+        for item in ["42", "office", "9?3", "903", "1"]:
+            consumed.append(item)
+            yield item
+
+    records = number_word_records(inputs(), major, limit=2, batch_size=2)
+    assert next(records) == {"number": "42", "words": major.number_to_words("42", 2)}
+    # Only the first batch has been read so far
+    assert consumed == ["42", "office"]
+    assert next(records) == {"word": "office", "major": "80"}
+    pattern = next(records)
+    assert pattern["pattern"] == "9?3"
+    assert pattern["matches"]["913"] == major.number_to_words("913", 2)
+    assert [record.get("number") for record in records] == ["903", "1"]
+
+
+def test_number_word_records_pos(capsys):
+    major = PhonemesMajorSystem()
+    major._index = MajorIndex(
+        {"17": ["dog"], "18": ["tough"]},
+        {"dog": "17", "tough": "18"},
+        {"dog": pos.NOUN, "tough": pos.ADJECTIVE},
+    )
+    records = number_word_records(["1?"], major, pos_mask=pos.NOUN)
+    assert list(records) == [{"pattern": "1?", "matches": {"17": ["dog"]}}]
+
+    print_pattern_words("1?", major, pos_mask=pos.NOUN)
+    assert capsys.readouterr().out == "17: dog\n\n"
+
+
+def test_summary_batches(capsys, monkeypatch):
+    batches = []
+    major = PhonemesMajorSystem()
+    original = major.number_to_words_many
+
+    def recording(numbers, limit=None):
+        batches.append(list(numbers))
+        return original(batches[-1], limit)
+
+    monkeypatch.setattr(major, "number_to_words_many", recording)
+    summary = Summary(major_system=major)
+    summary.batch_size = 4
+    with summary.printer_object() as printer:
+        for number in ["1", "2", "3", "4", "5"]:
+            printer(number)
+
+    assert batches == [["1", "2", "3", "4"], ["5"]]
+    out = capsys.readouterr().out
+    assert out.index("\n4: ") < out.index("\n5: ")
+
+
+@pytest.mark.parametrize("summary_class", [Summary, OrgSummary])
+def test_summary_jobs(capsys, summary_class):
+    numbers = [str(n) for n in range(10)] + [f"{n:02}" for n in range(250)]
+
+    def summary_output(jobs):
+        summary = summary_class(limit=3, jobs=jobs)
+        with summary.printer_object() as printer:
+            for number in numbers:
+                printer(number)
+        return capsys.readouterr().out
+
+    # Worker processes print the very same summary, in order
+    assert summary_output(jobs=3) == summary_output(jobs=1)
+
+
+@pytest.mark.parametrize("output_format", sorted(SUMMARY_FORMATS))
+def test_summary_formats(output_format):
+    summary_class = SUMMARY_FORMATS[output_format]
+    words = PhonemesMajorSystem().number_to_words_many(["42", "903"], limit=2)
+    out = io.StringIO()
+    summary = summary_class(limit=2)
+    summary.batch_size = 1
+    with summary.printer_object(out) as printer:
+        printer("42")
+        printer("903")
+    rendered = out.getvalue()
+
+    if output_format == "json":
+        assert json.loads(rendered) == [
+            {"number": number, "words": words[number]} for number in ["42", "903"]
+        ]
+    elif output_format == "csv":
+        rows = list(csv.reader(io.StringIO(rendered)))
+        assert rows == [["number", "words"]] + [
+            [number, ", ".join(words[number])] for number in ["42", "903"]
+        ]
+    else:
+        for number in ["42", "903"]:
+            assert number in rendered
+            assert all(word in rendered for word in words[number])
+        assert rendered.index("42") < rendered.index("903")
+
+
+def test_summary_empty_json():
+    out = io.StringIO()
+    with JsonSummary().printer_object(out):
+        pass
+    assert json.loads(out.getvalue()) == []
+
+
+def test_read_mapping(tmp_path):
+    config_file = tmp_path / "artofmemory.conf"
+    config_file.write_text(
+        "[pao]\n"
+        "23 = Michael Jordan, shooting, basketball\n"
+        "[major phonemes]\n"
+        "2 = N\n"
+        "7 = k, G, NG\n"
+        "[major letters]\n"
+        "6 = J, sh, ch\n"
+        "7 = c, k, q, g\n"
+    )
+    phonemes = read_mapping(
+        str(config_file), PHONEMES_SECTION, PhonemesMajorSystem.MAPPING
+    )
+    assert phonemes[2] == ["N"]
+    assert phonemes[7] == ["K", "G", "NG"]
+    assert phonemes[4] == PhonemesMajorSystem.MAPPING[4]
+
+    letters = read_mapping(str(config_file), LETTERS_SECTION, NaiveMajorSystem.MAPPING)
+    # "g" moved from 6 to 7
+    assert letters[6] == ["j", "sh", "ch"]
+    assert NaiveMajorSystem(mapping=letters).word_to_major("shag") == "67"
+
+    # Without the section the default mapping is kept
+    assert read_mapping(str(config_file), "other", {1: ["T"]}) == {1: ["T"]}
+
+
+def test_read_mapping_errors(tmp_path):
+    config_file = tmp_path / "artofmemory.conf"
+    config_file.write_text("[major phonemes]\n12 = T\n")
+    with pytest.raises(ValueError, match="not a digit"):
+        read_mapping(str(config_file), PHONEMES_SECTION, PhonemesMajorSystem.MAPPING)
+
+    config_file.write_text("[major phonemes]\n4 = R, RR\n")
+    with pytest.raises(ValueError, match="RR is not a CMU dictionary phoneme"):
+        read_mapping(str(config_file), PHONEMES_SECTION, PhonemesMajorSystem.MAPPING)
+
+    config_file.write_text("[major phonemes]\n4 = R\n4 = ER\n")
+    with pytest.raises(ValueError, match="already exists"):
+        read_mapping(str(config_file), PHONEMES_SECTION, PhonemesMajorSystem.MAPPING)
+
+
+def test_read_mapping_stresses(tmp_path):
+    config_file = tmp_path / "artofmemory.conf"
+    # Errors in other sections are none of the mapping's business
+    config_file.write_text(
+        "[pao]\n23 = Michael Jordan\n23 = Larry Bird\n[major phonemes]\n4 = R, er\n"
+    )
+    phonemes = read_mapping(
+        str(config_file), PHONEMES_SECTION, PhonemesMajorSystem.MAPPING
+    )
+    assert phonemes[4] == ["R", "ER0", "ER1", "ER2"]
+    assert PhonemesMajorSystem(mapping=phonemes).word_to_major("her") == "4"
+    assert read_mapping(str(tmp_path / "missing.conf"), PHONEMES_SECTION, {}) == {}
+
+
+def test_user_mapping():
+    mapping = {**PhonemesMajorSystem.MAPPING, 2: ["N"], 7: ["K", "G", "NG"]}
+    major = PhonemesMajorSystem(mapping=mapping)
+    assert major.word_to_major("finger") == "8774"
+    assert "finger" in major.number_to_words("8774")
+    assert PhonemesMajorSystem().word_to_major("finger") == "8274"
+
+
+def test_summary_numbers():
+    assert list(summary_numbers(8, 12)) == ["8", "9", "08", "09", "10", "11"]
+    assert list(summary_numbers(8, 11, width=4)) == ["0008", "0009", "0010"]
+
+
+def test_summary_parts(capsys):
+    summary = Summary(limit=1, jobs=2)
+    parts = []
+    # One set of workers serves every part
+    with summary.workers():
+        for numbers in batched(summary_numbers(0, 25, width=3), 10):
+            out = io.StringIO()
+            with summary.printer_object(out) as printer:
+                for number in numbers:
+                    printer(number)
+            parts.append(out.getvalue())
+
+    assert capsys.readouterr().out == ""
+    assert len(parts) == 3
+    assert all(part.startswith(explain()) for part in parts)
+    assert "\n010: " in parts[1] and "\n009: " not in parts[1]
+    assert "\n024: " in parts[2]
+
+
+def test_filter_pos(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    computed = []
+
+    def fake_wordnet_flags(words):
+        computed.append(len(words))
+        return {"dog": pos.NOUN | pos.VERB, "run": pos.VERB, "red": pos.ADJECTIVE}
+
+    monkeypatch.setattr(pos, "wordnet_flags", fake_wordnet_flags)
+    major = PhonemesMajorSystem()
+    major._index = MajorIndex(
+        {"17": ["dog"], "42": ["run"], "41": ["red"]},
+        {"dog": "17", "run": "42", "red": "41"},
+    )
+
+    words = ["dog", "run", "red", "the"]
+    assert major.filter_pos(words, pos.NOUN) == ["dog"]
+    assert major.filter_pos(words, pos.VERB) == ["dog", "run"]
+    assert major.filter_pos(words, pos.NOUN | pos.ADJECTIVE) == ["dog", "red"]
+    assert major.filter_pos(words, pos.VERB, limit=1) == ["dog"]
+    # Flags are computed once for the whole dictionary
+    assert computed == [3]
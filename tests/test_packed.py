@@ -0,0 +1,169 @@
+"""Ensure the packed index answers exactly like the in-memory index"""
+
+import os
+import stat
+
+import pytest
+
+from artofmemory import index, pos
+from artofmemory.index import MajorIndex, cache_path
+from artofmemory.major import PhonemesMajorSystem
+from artofmemory.packed import PackedIndex
+
+KEY = "0" * 40
+
+
+@pytest.fixture
+def small_index():
+    return MajorIndex(
+        {"17": ["dog", "tack", "tick"], "80": ["office"], "": ["eye"]},
+        {"dog": "17", "tack": "17", "tick": "17", "office": "80", "eye": ""},
+    )
+
+
+def test_round_trip(tmp_path, small_index):
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+
+    packed = PackedIndex.open(path, key=KEY)
+    assert packed.lookup("17") == ["dog", "tack", "tick"]
+    assert packed.lookup("") == ["eye"]
+    assert packed.lookup("99") == []
+    assert packed.digits_for("Office") == "80"
+    assert packed.digits_for("eye") == ""
+    assert packed.digits_for("cat") is None
+    packed.close()
+
+
+def test_stale_key(tmp_path, small_index):
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+
+    with pytest.raises(ValueError, match="stale"):
+        PackedIndex.open(path, key="1" * 40)
+
+
+def test_not_an_index():
+    with pytest.raises(ValueError, match="Not a packed"):
+        PackedIndex(b"certainly not an index")
+
+
+def test_index_file(tmp_path):
+    path = str(tmp_path / "major.idx")
+    PhonemesMajorSystem().write_index_file(path)
+
+    major = PhonemesMajorSystem(index_file=path)
+    assert isinstance(major.index, PackedIndex)
+    assert major.number_to_words("903") == PhonemesMajorSystem().number_to_words("903")
+    assert major.word_to_major("office") == "80"
+
+
+def test_prefix_queries(tmp_path, small_index):
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+    packed = PackedIndex.open(path)
+
+    assert list(packed.keys_with_prefix("")) == ["", "17", "80"]
+    assert packed.prefix_words("1") == ["dog", "tack", "tick"]
+    assert packed.longest_match("175") == ("17", ["dog", "tack", "tick"])
+    assert packed.longest_match("5") == ("", [])
+    assert list(packed.keys_matching("?7")) == ["17"]
+    assert list(packed.keys_matching("*")) == ["", "17", "80"]
+    assert list(packed.keys_matching("8?*")) == ["80"]
+    assert list(packed.keys_matching("2*")) == []
+
+
+def test_lookup_many(tmp_path, small_index):
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+    packed = PackedIndex.open(path)
+
+    assert packed.lookup_many(["80", "17", "99", ""]) == {
+        "": ["eye"],
+        "17": ["dog", "tack", "tick"],
+        "80": ["office"],
+        "99": [],
+    }
+
+
+def test_truncated(tmp_path, small_index):
+    path = tmp_path / "major.idx"
+    PackedIndex.write(small_index, str(path), KEY)
+    data = path.read_bytes()
+
+    with pytest.raises(ValueError, match="Truncated"):
+        PackedIndex(data[:-1])
+
+
+def test_file_is_shareable(tmp_path, small_index):
+    old_umask = os.umask(0o022)
+    try:
+        path = tmp_path / "major.idx"
+        PackedIndex.write(small_index, str(path), KEY)
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_pos_flags(tmp_path, small_index):
+    small_index.word_pos = {"dog": pos.NOUN | pos.VERB, "office": pos.NOUN}
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+    packed = PackedIndex.open(path)
+
+    assert packed.has_pos_flags
+    assert packed.pos_flags("dog") == pos.NOUN | pos.VERB
+    assert packed.pos_flags("tack") == 0
+    assert packed.filter_pos(["tack", "dog", "office"], pos.NOUN) == ["dog", "office"]
+
+
+def test_variants(tmp_path, small_index):
+    small_index.digit_words["80"].append("tick")
+    small_index.word_variants = {"tick": ["80"]}
+    path = str(tmp_path / "major.idx")
+    PackedIndex.write(small_index, path, KEY)
+    packed = PackedIndex.open(path)
+
+    assert packed.digits_all("Tick") == ["17", "80"]
+    assert packed.digits_all("dog") == ["17"]
+    assert packed.digits_all("cat") == []
+    assert packed.lookup("80") == ["office", "tick"]
+
+
+def test_compact(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    regular = PhonemesMajorSystem()
+    compact = PhonemesMajorSystem(compact=True)
+
+    assert isinstance(compact.index, PackedIndex)
+    assert os.path.exists(cache_path(compact.phonemes2num, "idx"))
+    assert len(compact.index) == len(regular.index)
+    assert compact.index.memory_usage() < regular.index.memory_usage() / 4
+    assert compact.number_to_words("903") == regular.number_to_words("903")
+    assert compact.word_to_major_all("often") == regular.word_to_major_all("often")
+
+    # Later engines map the cached copy
+    assert "office" in PhonemesMajorSystem(compact=True).index.lookup("80")
+
+
+def test_compact_pos_flags(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    computed = []
+
+    def fake_wordnet_flags(words):
+        computed.append(len(words))
+        return {"dog": pos.NOUN}
+
+    monkeypatch.setattr(pos, "wordnet_flags", fake_wordnet_flags)
+    monkeypatch.setattr(pos, "lookup_flags", None)
+    monkeypatch.setattr(index, "_INDEXES", {})
+    compact = PhonemesMajorSystem(compact=True)
+    assert not compact.index.has_pos_flags
+
+    assert compact.filter_pos(["cat", "dog"], pos.NOUN) == ["dog"]
+    assert compact.index.has_pos_flags
+    # Later runs map the repacked copy, with the flags
+    later = PhonemesMajorSystem(compact=True)
+    assert later.index.has_pos_flags
+    assert later.filter_pos(["dog", "cat"], pos.NOUN) == ["dog"]
+    assert len(computed) == 1
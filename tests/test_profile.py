@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+
+import pytest
+
+from artofmemory import profile
+
+
+@pytest.fixture
+def profiling():
+    profile.enable()
+    yield
+    profile.disable()
+
+
+def test_disabled_phases_are_shared_no_ops():
+    assert not profile.is_enabled()
+    assert profile.phase("query") is profile.phase("render")
+    with profile.phase("query"):
+        pass
+    assert profile.report()["phases"] == {}
+
+
+def test_nested_phases_are_exclusive(profiling):
+    with profile.phase("query"):
+        with profile.phase("index load"):
+            time.sleep(0.02)
+    with profile.phase("query"):
+        pass
+
+    phases = profile.report()["phases"]
+    assert phases["query"]["calls"] == 2
+    assert phases["index load"]["calls"] == 1
+    assert phases["index load"]["wall"] >= 0.02
+    assert phases["query"]["wall"] < 0.02
+
+
+def test_threads_time_their_own_phases(profiling):
+    entered = threading.Barrier(2)
+
+    def query():
+        with profile.phase("query"):
+            # Both threads are inside their phase, then leave it in turn
+            entered.wait()
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=query) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    phases = profile.report()["phases"]
+    assert phases["query"]["calls"] == 2
+    assert phases["query"]["wall"] >= 0.04
+
+
+def test_formats(profiling):
+    with profile.phase("render"):
+        pass
+
+    report = profile.report()
+    assert json.loads(profile.format_json(report))["phases"]["render"]["calls"] == 1
+
+    lines = profile.format_table(report).splitlines()
+    assert lines[0].split() == ["phase", "calls", "wall", "ms", "cpu", "ms"]
+    assert [line.split()[0] for line in lines[1:]] == ["render", "other", "total"]
@@ -0,0 +1,94 @@
+"""Ensure a client gets the same answers through the server as from the engine"""
+
+import json
+import socket
+import threading
+
+import pytest
+
+from artofmemory import pos
+from artofmemory.index import MajorIndex
+from artofmemory.major import PhonemesMajorSystem
+from artofmemory.server import MajorServer, MajorSystemClient
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    major = PhonemesMajorSystem()
+    major._index = MajorIndex(
+        {"17": ["dog", "tack", "tick"], "80": ["office"], "": ["eye"]},
+        {"dog": "17", "tack": "17", "tick": "17", "office": "80", "eye": ""},
+        {"dog": pos.NOUN, "tack": pos.NOUN | pos.VERB, "office": pos.NOUN},
+    )
+    path = str(tmp_path / "aom.sock")
+    server = MajorServer(path, major)
+    server.warm_up()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_client(socket_path):
+    with MajorSystemClient(socket_path) as client:
+        assert client.number_to_words("1-7") == ["dog", "tack", "tick"]
+        assert client.number_to_words_many(["17", "80", "99"]) == {
+            "17": ["dog", "tack", "tick"],
+            "80": ["office"],
+            "99": [],
+        }
+        assert client.word_to_major("Office") == "80"
+        assert list(client.words_to_major(["dog", "cat", "office"])) == ["17", "", "80"]
+        assert client.filter_pos(["dog", "tack", "tick"], pos.VERB) == ["tack"]
+        assert client.segment("1780") == [("17", "dog"), ("80", "office")]
+
+
+def test_client_errors(socket_path):
+    with MajorSystemClient(socket_path) as client:
+        with pytest.raises(ValueError, match="No sequence"):
+            client.segment("99")
+        with pytest.raises(ValueError, match="Unknown method"):
+            client._call("__init__")
+        # The connection is still usable after an error
+        assert client.word_to_major("dog") == "17"
+
+
+def test_bad_requests(socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        with sock.makefile("rwb") as fh:
+
+            def reply(line: bytes) -> dict:
+                fh.write(line + b"\n")
+                fh.flush()
+                return json.loads(fh.readline())
+
+            assert reply(b"[1]")["error"].startswith("Bad request")
+            assert reply(b"{not json")["error"].startswith("Bad request")
+            assert reply(b'{"method": "word_to_major", "args": "dog"}') == {
+                "error": "Bad request: args must be a list",
+                "type": "ValueError",
+            }
+            # An engine failure is not the client's fault, but is answered too
+            failed = reply(b'{"method": "word_to_major", "args": [5]}')
+            assert failed["type"] == "AttributeError"
+            assert not failed["error"].startswith("Bad request")
+            assert reply(b'{"method": "word_to_major", "args": ["dog"]}') == {
+                "result": "17"
+            }
+
+    with MajorSystemClient(socket_path) as client:
+        with pytest.raises(RuntimeError, match="TypeError"):
+            client._call("word_to_major")
+
+
+def test_live_socket_is_not_replaced(socket_path):
+    with pytest.raises(OSError, match="already listening"):
+        MajorServer(socket_path, PhonemesMajorSystem())
+
+
+def test_no_server(tmp_path):
+    with pytest.raises(OSError):
+        MajorSystemClient(str(tmp_path / "missing.sock"))
@@ -0,0 +1,38 @@
+"""Keep an eye on how much the CLI imports before running a command"""
+
+import os
+import subprocess
+import sys
+
+AOM = os.path.join(os.path.dirname(os.path.dirname(__file__)), "aom.py")
+
+# Generous ceiling for all imports of a quick command, in microseconds
+IMPORT_BUDGET_US = 500_000
+
+HEAVY_MODULES = {"artofmemory.major", "artofmemory.index", "pronouncing", "nltk"}
+
+
+def import_times(*args):
+    """Run aom.py with -X importtime, returning {module: self time in us}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", AOM, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        prefix, _, columns = line.partition(":")
+        if prefix != "import time" or "[us]" in columns:
+            continue
+        self_us, _, module = columns.split("|")
+        times[module.strip()] = int(self_us)
+    return times
+
+
+def test_card_startup():
+    times = import_times("card")
+
+    assert "artofmemory.cards" in times
+    assert not HEAVY_MODULES & set(times)
+    assert sum(times.values()) < IMPORT_BUDGET_US